@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to aggregate every continuous annotation within every parcellation.
+
+For each (space, density, hemisphere), the continuous maps are stacked into a
+single (vertices, maps) matrix and reduced against a sparse parcel-indicator
+matrix per parcellation, giving area-weighted means, weighted medians and
+vertex counts for all maps at once. Per-vertex `.txt` parcellations are read as
+well as `.label.gii` ones.
+"""
+
+from collections import defaultdict
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from mesh_cache import mesh_topology
+from scipy import sparse
+from surface_utils import HEMIS, find_surface, load_metric, parse_entities
+
+OUT_FNAME = "src-{space}_desc-parcelstats.npz"
+
+
+def parcel_indicator(labels: np.ndarray) -> tuple[np.ndarray, sparse.csr_matrix]:
+    """Return parcel keys and a (parcels, vertices) indicator matrix (0 = unlabeled)."""
+    mask = labels != 0
+    keys = np.unique(labels[mask])
+    indicator = sparse.csr_matrix(
+        (
+            np.ones(mask.sum()),
+            (np.searchsorted(keys, labels[mask]), np.flatnonzero(mask)),
+        ),
+        shape=(len(keys), len(labels)),
+    )
+    return keys, indicator
+
+
+def weighted_medians(
+    indicator: sparse.csr_matrix, values: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """Area-weighted (parcels, maps) medians of (vertices, maps) `values`.
+
+    Every (parcel, map) group is sorted at once, with a single cumulative sum of
+    the weights. NaNs are ignored.
+    """
+    coo = indicator.tocoo()
+    n_groups = indicator.shape[0] * values.shape[1]
+    groups = (coo.row[:, None] * values.shape[1] + np.arange(values.shape[1])).ravel()
+    weights = np.broadcast_to(weights[coo.col, None], (coo.nnz, values.shape[1]))
+    values, weights = values[coo.col].ravel(), weights.ravel()
+    valid = ~np.isnan(values)
+    groups, values, weights = groups[valid], values[valid], weights[valid]
+
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    cum = np.concatenate(([0.0], np.cumsum(weights[order])))
+    start = np.searchsorted(groups, np.arange(n_groups), side="left")
+    end = np.searchsorted(groups, np.arange(n_groups), side="right")
+    total = cum[end] - cum[start]
+
+    # First sorted vertex whose cumulative weight reaches half of the group
+    idx = np.searchsorted(cum[1:], cum[start] + total / 2, side="left")
+    idx = np.clip(idx, start, np.maximum(end - 1, start))
+    medians = np.full(n_groups, np.nan)
+    found = end > start
+    medians[found] = values[idx[found]]
+    return medians.reshape(indicator.shape[0], -1)
+
+
+def parcel_stats(
+    labels: np.ndarray, maps: np.ndarray, areas: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Aggregate stacked (vertices, maps) values within each parcel of `labels`."""
+    keys, indicator = parcel_indicator(labels)
+    valid = (~np.isnan(maps)).astype(np.float64)
+    filled = np.nan_to_num(maps, nan=0.0)
+
+    weighted = indicator @ sparse.diags(areas)
+    area_sums = weighted @ valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (weighted @ filled) / area_sums
+    return {
+        "parcel": keys,
+        "mean": means,
+        "median": weighted_medians(indicator, maps, areas),
+        "count": (indicator @ valid).astype(np.int64),
+        "area": area_sums,
+    }
+
+
+def find_areas(input_dir: Path, space: str, den: str, hemi: str) -> np.ndarray:
+    """Load vertex areas, falling back to computing them from the midthickness."""
+    prefix = f"src-{space}_den-{den}_hemi-{hemi}"
+    area_fpath = input_dir / space / f"{prefix}_desc-vaavg_midthickness.shape.gii"
+    if area_fpath.exists():
+        return load_metric(area_fpath).astype(np.float64)
+    mid_fpath = find_surface(
+        input_dir, space, den, hemi, "midthickness", generated=True
+    )
+    if mid_fpath is not None:
+        return np.asarray(mesh_topology(mid_fpath)["vertex_areas"], dtype=np.float64)
+    raise FileNotFoundError(f"Could not find vertex areas for: {prefix}")
+
+
+def text_parcellation_keys(fpath: Path) -> list[tuple[str, str, str]]:
+    """(space, density, hemisphere) groups of a per-vertex `.txt` parcellation.
+
+    Only `desc-PC` files are per-vertex labels (`desc-AT` ones are lookup tables),
+    and those duplicating a `.label.gii` are skipped. The density comes from the
+    number of lines if not in the name, and a parcellation without hemisphere
+    applies to both only in a symmetric space (`space-sym`).
+    """
+    entities = parse_entities(fpath.name)
+    if "src" not in entities or entities.get("desc") != "PC":
+        return []
+    if fpath.with_name(fpath.name.removesuffix(".txt") + ".label.gii").exists():
+        return []
+    if "den" in entities:
+        den = entities["den"]
+    else:
+        with open(fpath) as fh:
+            den = f"{round(sum(1 for _ in fh) / 1000)}k"
+    if "hemi" in entities:
+        hemis = [entities["hemi"]]
+    elif entities.get("space") == "sym":
+        hemis = list(HEMIS)
+    else:
+        print(f"WARNING: No hemisphere for {fpath.name}, skipping")
+        return []
+    return [(entities["src"], den, hemi) for hemi in hemis]
+
+
+def collect_annotations(
+    annot_dir: Path,
+) -> dict[tuple[str, str, str], dict[str, list[Path]]]:
+    """Group parcellations and continuous maps by (space, density, hemisphere)."""
+    groups = defaultdict(lambda: {"parcellations": [], "maps": []})
+    for fpath in sorted(annot_dir.rglob("*.txt")):
+        for key in text_parcellation_keys(fpath):
+            groups[key]["parcellations"].append(fpath)
+    for fpath in sorted(annot_dir.rglob("*.gii")):
+        entities = parse_entities(fpath.name)
+        if not {"src", "den", "hemi"} <= entities.keys():
+            continue
+        key = (entities["src"], entities["den"], entities["hemi"])
+        if fpath.name.endswith(".label.gii"):
+            groups[key]["parcellations"].append(fpath)
+        elif fpath.name.endswith((".func.gii", ".shape.gii")):
+            groups[key]["maps"].append(fpath)
+    return groups
+
+
+def load_parcellation(fpath: Path) -> tuple[np.ndarray, dict[int, str]]:
+    """Per-vertex labels of a parcellation, with the names of its keys if known."""
+    if fpath.suffix == ".txt":
+        return np.loadtxt(fpath, dtype=np.int64, ndmin=1), {}
+    parc = nib.load(fpath)
+    return np.asarray(parc.darrays[0].data), parc.labeltable.get_labels_as_dict()
+
+
+def aggregate_space(
+    input_dir: Path, space: str, groups: dict[tuple[str, str, str], dict]
+) -> dict[str, np.ndarray]:
+    """Aggregate all (parcellation, map) combinations of a space into columns."""
+    columns = defaultdict(list)
+    for (_, den, hemi), files in groups.items():
+        if not files["parcellations"] or not files["maps"]:
+            continue
+        areas = find_areas(input_dir=input_dir, space=space, den=den, hemi=hemi)
+        maps = np.column_stack(
+            [load_metric(fpath).astype(np.float64) for fpath in files["maps"]]
+        )
+        map_names = np.array([fpath.name.split(".")[0] for fpath in files["maps"]])
+
+        for parc_fpath in files["parcellations"]:
+            print(f"[AGGREGATING] {parc_fpath.name} x {len(map_names)} map(s)")
+            labels, names = load_parcellation(parc_fpath)
+            if len(labels) != len(maps):
+                print(f"WARNING: {parc_fpath.name} does not match the maps, skipping")
+                continue
+            stats = parcel_stats(labels=labels, maps=maps, areas=areas)
+
+            # Flatten (parcels, maps) into long-format columns
+            n_parcels, n_maps = stats["mean"].shape
+            columns["den"].append(np.full(n_parcels * n_maps, den))
+            columns["hemi"].append(np.full(n_parcels * n_maps, hemi))
+            columns["parcellation"].append(
+                np.full(n_parcels * n_maps, parc_fpath.name.split(".")[0])
+            )
+            columns["parcel"].append(np.repeat(stats["parcel"], n_maps))
+            columns["label"].append(
+                np.repeat([names.get(int(k), str(k)) for k in stats["parcel"]], n_maps)
+            )
+            columns["annotation"].append(np.tile(map_names, n_parcels))
+            for stat in ("mean", "median", "count", "area"):
+                columns[stat].append(stats[stat].ravel())
+
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def main() -> None:
+    input_dir = Path("share/Inputs")
+    output_dir = Path("share/Outputs")
+    resources_dir = Path("resources")
+
+    for space_dir in sorted(p for p in resources_dir.iterdir() if p.is_dir()):
+        groups = collect_annotations(space_dir / "annotations")
+        table = aggregate_space(
+            input_dir=input_dir, space=space_dir.name, groups=groups
+        )
+        if not table:
+            continue
+        out_fpath = output_dir / space_dir.name / OUT_FNAME.format(space=space_dir.name)
+        out_fpath.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(out_fpath, **table)
+        print(f"Parcel statistics saved to {out_fpath}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to align every pair of template spheres with surfalign.
+
+Promoted from the "Align Spheres using Metrics" cell of
+`notebooks/process_surfaces.ipynb`. Pairwise alignments are queued on a process
+pool where each worker is limited to a memory budget. surfalign works in a
+scratch directory; its registered sphere is then saved to
+`share/Outputs/<tgt>-<src>` under the canonical
+`src-<src>_to-<tgt>_den-<den>_hemi-<hemi>` name, together with the target
+midthickness resampled onto it (`desc-surfalign`, as the `_midthickness` name
+is the one `transform_midthickness.py` writes). A marker records the inputs of
+each completed pair, so reruns only process new (or changed) pairs.
+
+Requires `surfalign` to be installed in the environment.
+"""
+
+import argparse
+import itertools as it
+import json
+import os
+import resource
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from surface_utils import (
+    HEMIS,
+    barycentric_operator,
+    content_hash,
+    load_surface,
+    parse_entities,
+    save_surface,
+)
+
+DEFAULT_PARAMS = {"n_curv": 10, "n_sulc": 10}
+TEMPLATE_PARAMS = {"MEBRAINS": {"n_curv": 225, "n_sulc": 20}}
+METRICS_LIST = [["y", "z"], ["curv", "sulc"]]
+DONE_FNAME = "src-{src}_to-{tgt}_hemi-{hemi}_desc-surfalign.json"
+REGISTERED_FNAMES = {
+    "sphere": "src-{src}_to-{tgt}_den-{den}_hemi-{hemi}_sphere.surf.gii",
+    "midthickness": (
+        "src-{src}_to-{tgt}_den-{den}_hemi-{hemi}_desc-surfalign_midthickness.surf.gii"
+    ),
+}
+# Failures of a single alignment (surfalign, I/O, the memory budget or a worker
+# killed by it), which should not stop the other pairs
+ALIGN_ERRORS = (
+    OSError,
+    RuntimeError,
+    ValueError,
+    MemoryError,
+    subprocess.SubprocessError,
+)
+
+
+def find_templates(input_dir: Path) -> dict[str, dict[str, dict[str, Path]]]:
+    """Find the highest density midthickness and sphere of each template."""
+    templates = {}
+    for tpl_dir in sorted(p for p in input_dir.iterdir() if p.is_dir()):
+        surfs = {}
+        for hemi in HEMIS:
+            mids = sorted(
+                tpl_dir.glob(f"*_hemi-{hemi}_midthickness.*.gii"),
+                key=lambda fpath: int(parse_entities(fpath.name)["den"].rstrip("k")),
+            )
+            mids = [
+                mid
+                for mid in mids
+                if mid.with_name(mid.name.replace("midthickness", "sphere")).exists()
+            ]
+            if mids:
+                surfs[hemi] = {
+                    "mid": mids[-1],
+                    "sphere": mids[-1].with_name(
+                        mids[-1].name.replace("midthickness", "sphere")
+                    ),
+                }
+        if surfs.keys() == set(HEMIS):
+            templates[tpl_dir.name] = surfs
+    return templates
+
+
+def limit_memory(budget_gb: float) -> None:
+    """Cap the address space of a worker process."""
+    budget = int(budget_gb * 1024**3)
+    resource.setrlimit(resource.RLIMIT_AS, (budget, budget))
+
+
+def extract_template_metrics(
+    tpl: str, hemi: str, mid: Path, metrics_dir: Path
+) -> list[str]:
+    """Extract the alignment metrics of a template (cached by surfalign)."""
+    from surfalign.metrics import extract_metrics
+
+    return extract_metrics(
+        str(mid),
+        str(metrics_dir),
+        metric_list_heir=METRICS_LIST,
+        params=TEMPLATE_PARAMS.get(tpl, DEFAULT_PARAMS),
+        title=f"src-{tpl}_hemi-{hemi}",
+        clobber=False,
+    )
+
+
+def registered_fpaths(
+    src: str, tgt: str, hemi: str, src_surfs: dict[str, Path], out_dir: Path
+) -> dict[str, Path]:
+    """Canonical registered sphere and midthickness of a pair."""
+    den = parse_entities(src_surfs["sphere"].name)["den"]
+    return {
+        surf: out_dir / fname.format(src=src, tgt=tgt, den=den, hemi=hemi)
+        for surf, fname in REGISTERED_FNAMES.items()
+    }
+
+
+def find_registered_sphere(result: object, work_dir: Path) -> Path:
+    """Registered sphere among the return value and outputs of surfalign."""
+    returned = result if isinstance(result, (list, tuple)) else [result]
+    spheres = [
+        Path(item)
+        for item in returned
+        if isinstance(item, (str, Path))
+        and "sphere" in Path(item).name
+        and Path(item).name.endswith(".gii")
+    ]
+    if not spheres:
+        # The last sphere written (earlier ones are intermediate levels)
+        spheres = sorted(
+            work_dir.rglob("*sphere*.gii"),
+            key=lambda fpath: fpath.stat().st_mtime,
+            reverse=True,
+        )
+    if not spheres:
+        raise FileNotFoundError(f"surfalign wrote no sphere to {work_dir}")
+    return spheres[0]
+
+
+def align_pair(
+    src: str,
+    tgt: str,
+    hemi: str,
+    src_surfs: dict[str, Path],
+    tgt_surfs: dict[str, Path],
+    src_metrics: list[str],
+    tgt_metrics: list[str],
+    out_fpaths: dict[str, Path],
+) -> Path:
+    """Align the sphere of `src` (moving) to `tgt` (fixed), saving it canonically."""
+    from surfalign.surfalign import surfalign
+
+    title = f"src-{src}_to-{tgt}_hemi-{hemi}"
+    work_dir = out_fpaths["sphere"].parent / ".surfalign" / title
+    work_dir.mkdir(parents=True, exist_ok=True)
+    result = surfalign(
+        str(tgt_surfs["mid"]),
+        str(src_surfs["mid"]),
+        str(work_dir),
+        moving_sphere=str(src_surfs["sphere"]),
+        fixed_sphere=str(tgt_surfs["sphere"]),
+        fixed_metrics_list=tgt_metrics,
+        moving_metrics_list=src_metrics,
+        title=title,
+        clobber=True,
+    )
+    shutil.move(find_registered_sphere(result, work_dir), out_fpaths["sphere"])
+
+    # Source vertices on the target midthickness, through the registered sphere
+    registered, faces = load_surface(out_fpaths["sphere"])
+    tgt_sphere, tgt_faces = load_surface(tgt_surfs["sphere"])
+    tgt_mid, _ = load_surface(tgt_surfs["mid"])
+    centre = tgt_sphere.mean(axis=0)
+    interp = barycentric_operator(tgt_sphere - centre, tgt_faces, registered - centre)
+    save_surface(interp @ tgt_mid, faces, out_fpaths["midthickness"], hemi)
+    shutil.rmtree(work_dir)
+    return out_fpaths["sphere"]
+
+
+def pair_key(src_surfs: dict[str, Path], tgt_surfs: dict[str, Path]) -> str:
+    """Hash of the surfaces entering an alignment."""
+    return content_hash(
+        src_surfs["mid"], src_surfs["sphere"], tgt_surfs["mid"], tgt_surfs["sphere"]
+    )
+
+
+def is_done(done_fpath: Path, key: str, out_fpaths: dict[str, Path]) -> bool:
+    """Whether a pair was aligned from the same inputs and its outputs still exist."""
+    return (
+        all(fpath.exists() for fpath in out_fpaths.values())
+        and done_fpath.exists()
+        and json.loads(done_fpath.read_text())["key"] == key
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Align all pairs of template spheres with surfalign"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        type=Path,
+        default=Path("share/Inputs"),
+        help="Directory with one sub-directory per template (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=Path("share/Outputs"),
+        help="Directory to write `<tgt>-<src>` results to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--memory-gb",
+        type=float,
+        default=8.0,
+        help="Memory budget per alignment, in GB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of workers (default: as many as the memory budget allows)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which pairs would be aligned without aligning them",
+    )
+    args = parser.parse_args()
+
+    templates = find_templates(args.input_dir)
+    pending = []
+    for (src, src_hemis), (tgt, tgt_hemis) in it.combinations(templates.items(), 2):
+        for hemi in HEMIS:
+            out_dir = args.output_dir / f"{tgt}-{src}"
+            done_fpath = out_dir / DONE_FNAME.format(src=src, tgt=tgt, hemi=hemi)
+            out_fpaths = registered_fpaths(src, tgt, hemi, src_hemis[hemi], out_dir)
+            key = pair_key(src_hemis[hemi], tgt_hemis[hemi])
+            if is_done(done_fpath, key, out_fpaths):
+                continue
+            pending.append((src, tgt, hemi, out_fpaths, done_fpath, key))
+
+    print(f"Found {len(templates)} template(s), {len(pending)} pair(s) to align")
+    for src, tgt, hemi, *_ in pending:
+        print(f"  - {src} -> {tgt} (hemi={hemi})")
+    if args.dry_run or not pending:
+        return
+
+    total_gb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+    jobs = args.jobs or max(1, min(os.cpu_count(), int(total_gb // args.memory_gb)))
+    metrics_dir = args.output_dir / ".metrics"
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=limit_memory, initargs=(args.memory_gb,)
+    ) as pool:
+        # Metrics are computed once per template, before any pair needs them
+        needed = {(src, hemi) for src, _, hemi, *_ in pending}
+        needed |= {(tgt, hemi) for _, tgt, hemi, *_ in pending}
+        metric_futures = {
+            (tpl, hemi): pool.submit(
+                extract_template_metrics,
+                tpl=tpl,
+                hemi=hemi,
+                mid=templates[tpl][hemi]["mid"],
+                metrics_dir=metrics_dir,
+            )
+            for tpl, hemi in sorted(needed)
+        }
+        metrics = {item: future.result() for item, future in metric_futures.items()}
+
+        futures = {
+            pool.submit(
+                align_pair,
+                src=src,
+                tgt=tgt,
+                hemi=hemi,
+                src_surfs=templates[src][hemi],
+                tgt_surfs=templates[tgt][hemi],
+                src_metrics=metrics[(src, hemi)],
+                tgt_metrics=metrics[(tgt, hemi)],
+                out_fpaths=out_fpaths,
+            ): (src, tgt, hemi, done_fpath, key)
+            for src, tgt, hemi, out_fpaths, done_fpath, key in pending
+        }
+        for future in as_completed(futures):
+            src, tgt, hemi, done_fpath, key = futures[future]
+            try:
+                sphere_fpath = future.result()
+            except ALIGN_ERRORS as e:
+                print(f"✗ Failed to align {src} -> {tgt} (hemi={hemi}): {e}")
+                failed += 1
+                continue
+            done_fpath.write_text(json.dumps({"key": key, "sphere": sphere_fpath.name}))
+            print(f"✓ Aligned {src} -> {tgt} (hemi={hemi}): {sphere_fpath}")
+
+    print(f"Aligned {len(pending) - failed} pair(s), {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to benchmark the in-process surface stages on synthetic meshes.
+
+Deterministic icospheres and perturbed ("cortex-like") meshes are generated at
+the densities of the production spaces, so no data, network or Docker is
+needed. Each stage reports its best time, throughput (vertices/s) and peak
+memory; results are saved as JSON and can be compared against a baseline.
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+import scipy
+from surface_area.utils import get_map_info
+from surface_utils import (
+    ICOSPHERE_FREQUENCIES,
+    adjacency_matrix,
+    barycentric_operator,
+    fill_holes,
+    icosphere,
+    load_metric,
+    load_surface,
+    remove_islands,
+    save_metric,
+    save_surface,
+    vertex_areas,
+)
+
+DENSITIES = {**ICOSPHERE_FREQUENCIES, "164k": 128}
+MESHES = ("icosphere", "cortex")
+N_SCAN_FILES = 8
+
+
+def folding(sphere: np.ndarray, n_waves: int = 24) -> np.ndarray:
+    """Smooth deterministic pattern of gyri (> 0) and sulci (< 0) in [-1, 1]."""
+    rng = np.random.default_rng(seed=0)
+    directions = rng.normal(size=(n_waves, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    frequencies = rng.uniform(4.0, 12.0, size=n_waves)
+    phases = rng.uniform(0.0, 2 * np.pi, size=n_waves)
+    waves = np.cos((sphere @ directions.T) * frequencies + phases)
+    return waves.sum(axis=1) / np.sqrt(n_waves)
+
+
+def generate_mesh(mesh: str, density: str) -> dict[str, np.ndarray]:
+    """Synthetic surface, its sphere and a medial-wall-like mask."""
+    sphere, faces = icosphere(DENSITIES[density])
+    pattern = folding(sphere)
+    coords = sphere * 50.0
+    if mesh == "cortex":
+        coords = sphere * (1.0 + 0.08 * pattern[:, None]) * [35.0, 50.0, 30.0]
+    # A noisy cap with islands and holes, as produced by volume-to-surface mapping
+    mask = (sphere[:, 0] + 0.3 * pattern) > 0.6
+    return {"coords": coords, "faces": faces, "sphere": sphere * 100.0, "mask": mask}
+
+
+def rotation(angle_deg: float) -> np.ndarray:
+    """Rotation about an oblique axis, to misalign two otherwise equal spheres."""
+    axis = np.array([1.0, 2.0, 3.0]) / np.sqrt(14.0)
+    angle = np.deg2rad(angle_deg)
+    cross = np.array(
+        [[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]]
+    )
+    return np.eye(3) + np.sin(angle) * cross + (1 - np.cos(angle)) * cross @ cross
+
+
+def stage_functions(mesh: dict[str, np.ndarray], work_dir: Path) -> dict:
+    """Callables for each benchmarked stage, with the vertices each processes."""
+    coords, faces, n_vertices = mesh["coords"], mesh["faces"], len(mesh["coords"])
+    surf_fpath = work_dir / "src-D99_den-bench_hemi-L_midthickness.surf.gii"
+    metric_fpath = (
+        work_dir / "src-D99_den-bench_hemi-L_desc-vaavg_midthickness.shape.gii"
+    )
+    save_surface(coords, faces, surf_fpath, hemi="L")
+    save_metric(vertex_areas(coords, faces), metric_fpath, hemi="L")
+    scan_fpaths = [
+        save_metric(
+            coords[:, 0], work_dir / f"src-D99_hemi-L_desc-{idx}_annot.func.gii", "L"
+        )
+        for idx in range(N_SCAN_FILES)
+    ]
+    tgt_sphere = mesh["sphere"] @ rotation(5.0).T
+    # As cached per surface by the pipeline stages
+    adj = adjacency_matrix(faces, n_vertices)
+    data = coords[:, 0]
+
+    def resample():
+        operator = barycentric_operator(mesh["sphere"], faces, tgt_sphere)
+        return operator @ data
+
+    return {
+        "vertex_areas": (lambda: vertex_areas(coords, faces), n_vertices),
+        "gifti_save": (
+            lambda: save_surface(coords, faces, work_dir / "out.surf.gii", "L"),
+            n_vertices,
+        ),
+        "gifti_load": (lambda: load_surface(surf_fpath), n_vertices),
+        "metric_load": (lambda: load_metric(metric_fpath), n_vertices),
+        "medial_wall": (
+            lambda: fill_holes(remove_islands(mesh["mask"], faces, adj), faces, adj),
+            n_vertices,
+        ),
+        "metadata_scan": (
+            lambda: [get_map_info(fpath) for fpath in scan_fpaths],
+            n_vertices * N_SCAN_FILES,
+        ),
+        "resample": (resample, n_vertices),
+    }
+
+
+def measure(func, repeats: int) -> tuple[float, float]:
+    """Best wall time over `repeats` runs and peak traced memory (MB) of one run."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # Measured separately, as tracing slows down allocations
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 1024**2
+
+
+def run_benchmarks(
+    densities: list[str], meshes: list[str], stages: list[str] | None, repeats: int
+) -> list[dict]:
+    """Run every stage on every mesh and density."""
+    results = []
+    for density in densities:
+        for mesh_name in meshes:
+            mesh = generate_mesh(mesh_name, density)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                funcs = stage_functions(mesh, Path(tmp_dir))
+                for stage, (func, n_vertices) in funcs.items():
+                    if stages and stage not in stages:
+                        continue
+                    seconds, peak_mb = measure(func, repeats=repeats)
+                    results.append(
+                        {
+                            "stage": stage,
+                            "mesh": mesh_name,
+                            "density": density,
+                            "n_vertices": len(mesh["coords"]),
+                            "seconds": seconds,
+                            "vertices_per_s": n_vertices / seconds,
+                            "peak_mb": peak_mb,
+                        }
+                    )
+                    print(
+                        f"{stage:>14} | {mesh_name:>9} | {density:>5} | "
+                        f"{seconds * 1e3:9.2f} ms | "
+                        f"{n_vertices / seconds / 1e6:8.2f} Mvert/s | "
+                        f"{peak_mb:8.1f} MB"
+                    )
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> int:
+    """Print the slowdown against a baseline; return the number of regressions."""
+    previous = {(r["stage"], r["mesh"], r["density"]): r for r in baseline}
+    regressions = 0
+    print(f"\nComparison with baseline (tolerance={tolerance:.0%}):")
+    for result in results:
+        key = (result["stage"], result["mesh"], result["density"])
+        if key not in previous:
+            continue
+        ratio = result["seconds"] / previous[key]["seconds"]
+        regressed = ratio > 1 + tolerance
+        regressions += regressed
+        print(
+            f"{'✗' if regressed else '✓'} {' | '.join(key)}: {ratio:.2f}x time, "
+            f"{result['peak_mb'] - previous[key]['peak_mb']:+.1f} MB"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark surface stages on synthetic meshes"
+    )
+    parser.add_argument(
+        "-d",
+        "--densities",
+        nargs="+",
+        choices=DENSITIES.keys(),
+        default=list(DENSITIES),
+        help="Mesh densities to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "-m",
+        "--meshes",
+        nargs="+",
+        choices=MESHES,
+        default=list(MESHES),
+        help="Synthetic meshes to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "-s", "--stages", nargs="+", default=None, help="Only run these stages"
+    )
+    parser.add_argument(
+        "-r",
+        "--repeats",
+        type=int,
+        default=3,
+        help="Runs per stage, the best is kept (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("benchmark.json"),
+        help="File to save results to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--baseline", type=Path, default=None, help="Results to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative slowdown reported as a regression (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        densities=args.densities,
+        meshes=args.meshes,
+        stages=args.stages,
+        repeats=args.repeats,
+    )
+    args.output.write_text(
+        json.dumps(
+            {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "scipy": scipy.__version__,
+                "nibabel": nib.__version__,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results saved to {args.output}")
+
+    if args.baseline is None:
+        return 0
+    baseline = json.loads(args.baseline.read_text())["results"]
+    return 1 if compare(results, baseline, tolerance=args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to resample every surface annotation to every standard density.
+
+Each space gets a pyramid of nested levels (10k, 32k, 41k, 101k and any density
+it already has spheres for). Missing levels use a geodesic sphere with the
+midthickness interpolated from the densest existing one, both saved as
+`desc-geodesic` in `share/Outputs/<space>/pyramid` (apart from the native
+surfaces, which other stages process) so that the resampled annotations have a
+mesh. Sparse down- and up-sampling operators between neighbouring levels are
+cached, and chained to move each annotation from its own density to all others:
+continuous maps are averaged weighted by vertex area, labels take the weighted
+mode.
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from mesh_cache import mesh_topology
+from scipy import sparse
+from surface_utils import (
+    GEODESIC_DESC,
+    HEMIS,
+    ICOSPHERE_FREQUENCIES,
+    barycentric_operator,
+    cached_operator,
+    content_hash,
+    icosphere,
+    load_metric,
+    parse_entities,
+    pyramid_dir,
+    save_label,
+    save_metric,
+    save_surface,
+    vertex_areas,
+    weighted_mode,
+)
+
+MANIFEST_FNAME = "src-{space}_desc-pyramid.json"
+
+
+def n_vertices(den: str) -> int:
+    """Approximate vertex count of a density entity (e.g. `41k`)."""
+    return int(den.rstrip("k")) * 1000
+
+
+def load_level(sphere_fpath: Path) -> dict[str, np.ndarray]:
+    """Sphere, triangles, midthickness and vertex areas of a saved level."""
+    sphere_mesh = mid_mesh = mesh_topology(sphere_fpath)
+    mid_fpath = sphere_fpath.with_name(
+        sphere_fpath.name.replace("sphere", "midthickness")
+    )
+    if mid_fpath.exists():
+        mid_mesh = mesh_topology(mid_fpath)
+    return {
+        "sphere": np.asarray(sphere_mesh["coords"], dtype=np.float64),
+        "faces": np.asarray(sphere_mesh["faces"], dtype=np.int64),
+        "mid": np.asarray(mid_mesh["coords"], dtype=np.float64),
+        "areas": np.asarray(mid_mesh["vertex_areas"], dtype=np.float64),
+        "has_mid": mid_fpath.exists(),
+    }
+
+
+def find_levels(
+    input_dir: Path, space: str, hemi: str
+) -> dict[str, dict[str, np.ndarray]]:
+    """Sphere, triangles and vertex areas of every pyramid level of a space.
+
+    Levels without a native sphere are generated and their sphere and
+    midthickness saved as `desc-geodesic` in the pyramid directory of the space,
+    so that later runs load them (only ever as generated levels).
+    """
+    levels = {}
+    for sphere_fpath in sorted((input_dir / space).glob(f"*_hemi-{hemi}_sphere.*.gii")):
+        levels[parse_entities(sphere_fpath.name)["den"]] = load_level(sphere_fpath)
+    if not levels:
+        return {}
+
+    # Missing levels: geodesic sphere, midthickness from the densest native level
+    ref = levels[max(levels, key=n_vertices)]
+    centre = ref["sphere"].mean(axis=0)
+    radius = np.linalg.norm(ref["sphere"] - centre, axis=1).mean()
+    out_dir = pyramid_dir(input_dir, space)
+    for den, frequency in ICOSPHERE_FREQUENCIES.items():
+        if den in levels:
+            continue
+        prefix = f"src-{space}_den-{den}_hemi-{hemi}_desc-{GEODESIC_DESC}"
+        if (sphere_fpath := out_dir / f"{prefix}_sphere.surf.gii").exists():
+            levels[den] = load_level(sphere_fpath)
+            continue
+        unit, faces = icosphere(frequency)
+        sphere = centre + radius * unit
+        interp = barycentric_operator(ref["sphere"] - centre, ref["faces"], unit)
+        mid = interp @ ref["mid"]
+        print(f"[GENERATING] {sphere_fpath.name} (not fs_LR)")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        save_surface(sphere, faces, sphere_fpath, hemi, "Spherical")
+        if ref["has_mid"]:
+            save_surface(mid, faces, out_dir / f"{prefix}_midthickness.surf.gii", hemi)
+        levels[den] = {
+            "sphere": sphere,
+            "faces": faces,
+            "mid": mid,
+            "areas": vertex_areas(mid, faces),
+            "has_mid": ref["has_mid"],
+        }
+    return dict(sorted(levels.items(), key=lambda item: n_vertices(item[0])))
+
+
+def level_operators(
+    coarse: dict[str, np.ndarray], fine: dict[str, np.ndarray]
+) -> tuple[sparse.csr_matrix, sparse.csr_matrix]:
+    """Cached (down, up) operators between two neighbouring levels."""
+    key = content_hash(
+        coarse["sphere"], coarse["faces"], fine["sphere"], fine["faces"], fine["areas"]
+    )
+
+    def build_up():
+        # Fine vertices interpolate the coarse triangle they fall in
+        return barycentric_operator(coarse["sphere"], coarse["faces"], fine["sphere"])
+
+    up = cached_operator("pyramid-up", key, build_up)
+
+    def build_down():
+        # Coarse vertices average the fine vertices they interpolate, by area
+        down = up.T @ sparse.diags(fine["areas"])
+        empty = np.asarray(down.sum(axis=1)).ravel() == 0
+        if empty.any():
+            nearest = barycentric_operator(
+                fine["sphere"], fine["faces"], coarse["sphere"]
+            )
+            down = down + sparse.diags(empty.astype(np.float64)) @ nearest
+        return sparse.diags(1.0 / np.asarray(down.sum(axis=1)).ravel()) @ down
+
+    return cached_operator("pyramid-down", key, build_down), up
+
+
+def chain_operators(
+    levels: dict[str, dict[str, np.ndarray]],
+) -> dict[tuple[str, str], sparse.csr_matrix]:
+    """Operators from every level to every other, composed through the pyramid."""
+    dens = list(levels)
+    steps = {}
+    for coarse, fine in zip(dens[:-1], dens[1:]):
+        steps[(fine, coarse)], steps[(coarse, fine)] = level_operators(
+            levels[coarse], levels[fine]
+        )
+
+    chains = {}
+    for i, src in enumerate(dens):
+        for direction in (-1, 1):
+            operator = None
+            j = i
+            while 0 <= j + direction < len(dens):
+                step = steps[(dens[j], dens[j + direction])]
+                operator = step if operator is None else (step @ operator).tocsr()
+                j += direction
+                chains[(src, dens[j])] = operator
+    return chains
+
+
+def resample_maps(operator: sparse.csr_matrix, maps: np.ndarray) -> np.ndarray:
+    """Apply an averaging operator to stacked maps, ignoring NaN values."""
+    valid = np.isfinite(maps)
+    total = operator @ valid.astype(np.float64)
+    values = operator @ np.where(valid, maps, 0.0)
+    return np.divide(values, total, out=np.full_like(values, np.nan), where=total > 0)
+
+
+def find_sources(annot_dir: Path, generated: set[str]) -> dict[tuple, list[Path]]:
+    """Densest original of each annotation, grouped by (density, hemisphere)."""
+    originals = defaultdict(dict)
+    for fpath in sorted(annot_dir.rglob("*.gii")):
+        entities = parse_entities(fpath.name)
+        if fpath.name in generated or not {"den", "hemi"} <= entities.keys():
+            continue
+        if not fpath.name.endswith((".label.gii", ".func.gii", ".shape.gii")):
+            continue
+        name = fpath.name.replace(f"_den-{entities['den']}", "_den-{den}")
+        originals[(fpath.parent, name)][entities["den"]] = fpath
+
+    sources = defaultdict(list)
+    for dens in originals.values():
+        den = max(dens, key=n_vertices)
+        sources[(den, parse_entities(dens[den].name)["hemi"])].append(dens[den])
+    return sources
+
+
+def build_space(input_dir: Path, resources_dir: Path, space: str) -> None:
+    """Resample every annotation of a space to every pyramid level."""
+    manifest_fpath = resources_dir / space / MANIFEST_FNAME.format(space=space)
+    manifest = json.loads(manifest_fpath.read_text()) if manifest_fpath.exists() else {}
+    sources = find_sources(resources_dir / space / "annotations", set(manifest))
+
+    for hemi in HEMIS:
+        levels = find_levels(input_dir, space, hemi)
+        if not levels:
+            continue
+        chains = chain_operators(levels)
+        print(f"[PYRAMID] {space} (hemi={hemi}, levels={', '.join(levels)})")
+
+        for (src_den, src_hemi), fpaths in sources.items():
+            if src_hemi != hemi or src_den not in levels:
+                continue
+            keys = {fpath: content_hash(fpath) for fpath in fpaths}
+            for den in levels:
+                if den == src_den:
+                    continue
+                targets = {
+                    fpath: fpath.with_name(
+                        fpath.name.replace(f"_den-{src_den}", f"_den-{den}")
+                    )
+                    for fpath in fpaths
+                }
+                # Never overwrite originals; skip outputs of an unchanged source
+                targets = {
+                    fpath: out_fpath
+                    for fpath, out_fpath in targets.items()
+                    if not out_fpath.exists()
+                    or manifest.get(out_fpath.name, keys[fpath]) != keys[fpath]
+                }
+                if not targets:
+                    continue
+                operator = chains[(src_den, den)]
+
+                # Continuous maps: one multiplication for all maps of a density
+                scalars = [f for f in targets if not f.name.endswith(".label.gii")]
+                if scalars:
+                    maps = np.column_stack(
+                        [load_metric(fpath).astype(np.float64) for fpath in scalars]
+                    )
+                    for fpath, values in zip(scalars, resample_maps(operator, maps).T):
+                        save_metric(values, targets[fpath], hemi=hemi)
+                        manifest[targets[fpath].name] = keys[fpath]
+
+                for fpath in targets:
+                    if not fpath.name.endswith(".label.gii"):
+                        continue
+                    label = nib.load(fpath)
+                    save_label(
+                        weighted_mode(operator, np.asarray(label.darrays[0].data)),
+                        targets[fpath],
+                        hemi=hemi,
+                        names=label.labeltable.get_labels_as_dict(),
+                        colors={
+                            entry.key: entry.rgba for entry in label.labeltable.labels
+                        },
+                    )
+                    manifest[targets[fpath].name] = keys[fpath]
+                print(f"  {src_den} -> {den}: {len(targets)} annotation(s)")
+
+    if manifest:
+        manifest_fpath.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Resample surface annotations to every standard density"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        type=Path,
+        default=Path("share/Inputs"),
+        help="Directory with the spheres of each space (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--resources-dir",
+        type=Path,
+        default=Path("resources"),
+        help="Directory with the annotations of each space (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-s", "--spaces", nargs="+", default=None, help="Only process these spaces"
+    )
+    args = parser.parse_args()
+
+    for space_dir in sorted(p for p in args.resources_dir.iterdir() if p.is_dir()):
+        if args.spaces and space_dir.name not in args.spaces:
+            continue
+        build_space(
+            input_dir=args.input_dir,
+            resources_dir=args.resources_dir,
+            space=space_dir.name,
+        )
+
+
+if __name__ == "__main__":
+    main()
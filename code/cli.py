@@ -0,0 +1,111 @@
+"""Single command-line entry point to the pipeline stages (`neuromaps-nhp-prep`).
+
+Each stage subcommand passes its arguments on to the `main` of its script, which
+is only imported when the subcommand runs. The scripts in turn only import
+niwrap (and set up the container runner) once they have work to do, so `--help`,
+`--dry-run`, `index` and `plan` return without starting a container.
+"""
+
+import argparse
+import importlib
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+STAGES = {
+    "areas": (
+        "compute_surface_areas",
+        "Compute surface areas from midthickness files",
+    ),
+    "medial-wall": (
+        "extract_medial_wall",
+        "Extract the medial wall of NHP templates",
+    ),
+    "transform": (
+        "transform_midthickness",
+        "Transform midthickness surfaces to target space",
+    ),
+    "rename": (
+        "rename_surfaces",
+        "Rename input and output surfaces to the canonical scheme",
+    ),
+}
+# As in `surface_utils.parse_entities`, without importing NumPy and nibabel
+ENTITY_REGEX = re.compile(r"([a-zA-Z0-9]+)-([a-zA-Z0-9]+)")
+
+
+def run_stage(name: str, argv: list[str]) -> int:
+    """Run the script of a stage as if called with `argv`."""
+    # Sibling module of the installed package, or of this script in `code/`
+    module = importlib.import_module(
+        f".{STAGES[name][0]}" if __package__ else STAGES[name][0], __package__
+    )
+    sys.argv = [f"neuromaps-nhp-prep {name}", *argv]
+    return module.main() or 0
+
+
+def index(share_dir: Path) -> None:
+    """Print the densities and surfaces found for each template and registration."""
+    for kind in ("Inputs", "Outputs"):
+        if not (share_dir / kind).exists():
+            continue
+        print(f"{kind}:")
+        for tpl_dir in sorted(p for p in (share_dir / kind).iterdir() if p.is_dir()):
+            surfs = defaultdict(set)
+            for fpath in tpl_dir.glob("*.gii"):
+                stem = fpath.name.split(".")[0]
+                entities = dict(ENTITY_REGEX.findall(stem))
+                if "den" in entities:
+                    surfs[entities["den"]].add(stem.rsplit("_", 1)[-1])
+            dens = sorted(surfs, key=lambda den: int(den.rstrip("k")))
+            listing = "; ".join(
+                f"{den} ({', '.join(sorted(surfs[den]))})" for den in dens
+            )
+            print(f"  {tpl_dir.name}: {listing or 'no surfaces'}")
+
+
+def plan() -> int:
+    """Print what every stage would process."""
+    failed = 0
+    for name in STAGES:
+        print(f"[{name}]")
+        failed += run_stage(name, ["--dry-run"]) != 0
+    return failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="neuromaps-nhp-prep",
+        description="Prepare NHP surfaces and annotations for neuromaps",
+        epilog="Run `neuromaps-nhp-prep <stage> --help` for the options of a stage.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_) in STAGES.items():
+        # Options are parsed by the stage script itself
+        subparsers.add_parser(name, help=help_, add_help=False)
+    index_parser = subparsers.add_parser(
+        "index", help="List the densities and surfaces of each template"
+    )
+    index_parser.add_argument(
+        "share_dir",
+        type=Path,
+        nargs="?",
+        default=Path("share"),
+        help="Directory with `Inputs` and `Outputs` (default: %(default)s)",
+    )
+    subparsers.add_parser("plan", help="Show what every stage would process")
+    args, stage_args = parser.parse_known_args()
+
+    if args.command in STAGES:
+        return run_stage(args.command, stage_args)
+    if stage_args:
+        parser.error(f"unrecognized arguments: {' '.join(stage_args)}")
+    if args.command == "index":
+        index(args.share_dir)
+        return 0
+    return plan()
+
+
+if __name__ == "__main__":
+    exit(main())
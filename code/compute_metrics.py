@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to compute curvature and sulcal depth of midthickness surfaces.
+
+Mean curvature uses the cotangent Laplacian and Gaussian curvature the angle
+deficit, both vectorized over faces. Sulcal depth is the distance to the convex
+hull (or the displacement to the inflated surface). Vertex areas and normals
+come from the shared mesh cache, and results are cached by the hash of the input
+surfaces.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+from mesh_cache import mesh_topology
+from scipy import sparse
+from scipy.spatial import ConvexHull
+from surface_utils import (
+    CACHE_DIR,
+    content_hash,
+    mesh_orientation,
+    parse_entities,
+    save_metric,
+)
+from symmetry import left_counterpart, mirror_data, mirror_permutation
+
+HULL_CHUNK = 8192
+OUT_FNAMES = {
+    "mean": "src-{space}_den-{den}_hemi-{hemi}_curv-mean_desc-CV_annot.shape.gii",
+    "gaussian": "src-{space}_den-{den}_hemi-{hemi}_curv-gaussian_desc-CV_annot.shape.gii",
+    "depth": "src-{space}_den-{den}_hemi-{hemi}_desc-SD_annot.shape.gii",
+}
+
+
+def cotangent_laplacian(coords: np.ndarray, faces: np.ndarray) -> sparse.csr_matrix:
+    """Cotangent Laplacian `L = D - W`, with `W_ij = (cot a + cot b) / 2`."""
+    rows, cols, weights = [], [], []
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        e1 = coords[faces[:, j]] - coords[faces[:, i]]
+        e2 = coords[faces[:, k]] - coords[faces[:, i]]
+        cross = np.linalg.norm(np.cross(e1, e2), axis=1)
+        cot = np.einsum("ij,ij->i", e1, e2) / np.maximum(cross, 1e-12)
+        # The angle at corner i weighs the opposite edge (j, k)
+        rows.extend((faces[:, j], faces[:, k]))
+        cols.extend((faces[:, k], faces[:, j]))
+        weights.extend((0.5 * cot, 0.5 * cot))
+
+    n_vertices = len(coords)
+    weights = sparse.csr_matrix(
+        (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_vertices, n_vertices),
+    )
+    return (sparse.diags(np.asarray(weights.sum(axis=1)).ravel()) - weights).tocsr()
+
+
+def mean_curvature(
+    coords: np.ndarray, faces: np.ndarray, areas: np.ndarray, normals: np.ndarray
+) -> np.ndarray:
+    """Mean curvature, positive in sulci (FreeSurfer convention).
+
+    Normals are flipped outwards first if the triangles are wound inwards.
+    """
+    normals = mesh_orientation(coords, faces) * np.asarray(normals)
+    laplacian = cotangent_laplacian(coords, faces)
+    curv = np.einsum("ij,ij->i", laplacian @ coords, normals) / (2 * areas)
+    return -np.nan_to_num(curv)
+
+
+def gaussian_curvature(
+    coords: np.ndarray, faces: np.ndarray, areas: np.ndarray
+) -> np.ndarray:
+    """Gaussian curvature from the angle deficit at each vertex."""
+    angles = np.zeros(faces.shape)
+    for i in range(3):
+        e1 = coords[faces[:, (i + 1) % 3]] - coords[faces[:, i]]
+        e2 = coords[faces[:, (i + 2) % 3]] - coords[faces[:, i]]
+        cos = np.einsum("ij,ij->i", e1, e2) / (
+            np.linalg.norm(e1, axis=1) * np.linalg.norm(e2, axis=1)
+        )
+        angles[:, i] = np.arccos(np.clip(cos, -1.0, 1.0))
+
+    angle_sums = np.bincount(
+        faces.ravel(), weights=angles.ravel(), minlength=len(coords)
+    )
+    return np.nan_to_num((2 * np.pi - angle_sums) / areas)
+
+
+def hull_depth(coords: np.ndarray) -> np.ndarray:
+    """Distance to the convex hull, i.e. to the closest hull facet plane."""
+    equations = ConvexHull(coords).equations
+    depth = np.empty(len(coords))
+    for start in range(0, len(coords), HULL_CHUNK):
+        chunk = coords[start : start + HULL_CHUNK]
+        depth[start : start + HULL_CHUNK] = -np.max(
+            chunk @ equations[:, :3].T + equations[:, 3], axis=1
+        )
+    return np.maximum(depth, 0.0)
+
+
+def inflated_depth(
+    coords: np.ndarray, areas: np.ndarray, inflated_mesh: dict[str, np.ndarray]
+) -> np.ndarray:
+    """Displacement from the inflated surface along its outward normals, centred."""
+    inflated = np.asarray(inflated_mesh["coords"], dtype=np.float64)
+    normals = mesh_orientation(inflated, inflated_mesh["faces"]) * np.asarray(
+        inflated_mesh["vertex_normals"]
+    )
+    scale = np.sqrt(areas.sum() / inflated_mesh["vertex_areas"].sum(dtype=np.float64))
+    inflated = (inflated - inflated.mean(axis=0)) * scale + coords.mean(axis=0)
+    depth = np.einsum("ij,ij->i", inflated - coords, normals)
+    return depth - depth.mean()
+
+
+def surface_metrics(mid_fpath: Path, method: str) -> dict[str, np.ndarray]:
+    """Compute (or load from cache) the metrics of a midthickness surface."""
+    inflated_fpath = mid_fpath.with_name(
+        mid_fpath.name.replace("midthickness", "inflated")
+    )
+    if method == "inflated" and not inflated_fpath.exists():
+        print(f"WARNING: No inflated surface for {mid_fpath.name}, using convex hull")
+        method = "hull"
+    inputs = (mid_fpath, inflated_fpath) if method == "inflated" else (mid_fpath,)
+    # Salted so that metrics cached before normals were oriented are recomputed
+    key = content_hash(*inputs, method, "oriented")
+    cache_fpath = CACHE_DIR / f"metrics_{key}.npz"
+    if cache_fpath.exists():
+        with np.load(cache_fpath) as npz:
+            return dict(npz)
+
+    mesh = mesh_topology(mid_fpath)
+    coords = np.asarray(mesh["coords"], dtype=np.float64)
+    faces = np.asarray(mesh["faces"], dtype=np.int64)
+    areas = np.asarray(mesh["vertex_areas"], dtype=np.float64)
+    metrics = {
+        "mean": mean_curvature(coords, faces, areas, mesh["vertex_normals"]),
+        "gaussian": gaussian_curvature(coords, faces, areas),
+        "depth": (
+            inflated_depth(coords, areas, mesh_topology(inflated_fpath))
+            if method == "inflated"
+            else hull_depth(coords)
+        ),
+    }
+    cache_fpath.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_fpath, **metrics)
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compute curvature and sulcal depth of midthickness surfaces"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        type=Path,
+        default=Path("share/Inputs"),
+        help="Directory to search for midthickness surfaces (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--method",
+        choices=("hull", "inflated"),
+        default="hull",
+        help="Reference surface for sulcal depth (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--symmetric",
+        action="store_true",
+        help="Mirror the left hemisphere when the right one is its mirror image",
+    )
+    args = parser.parse_args()
+
+    for mid_fpath in sorted(args.input_dir.rglob("*_midthickness.*.gii")):
+        if not mid_fpath.name.endswith(("surf.gii", "rsl.gii")):
+            continue
+        print(f"[PROCESSING] {mid_fpath.name} (method={args.method})")
+        entities = parse_entities(mid_fpath.name)
+        left_fpath = left_counterpart(mid_fpath) if args.symmetric else None
+        perm = mirror_permutation(left_fpath, mid_fpath) if left_fpath else None
+        if perm is not None:
+            print(f"Mirroring metrics of {left_fpath.name}")
+            metrics = {
+                name: mirror_data(data, perm)
+                for name, data in surface_metrics(left_fpath, args.method).items()
+            }
+        else:
+            metrics = surface_metrics(mid_fpath=mid_fpath, method=args.method)
+        for name, data in metrics.items():
+            out_fpath = mid_fpath.parent / OUT_FNAMES[name].format(
+                space=entities["src"], den=entities["den"], hemi=entities["hemi"]
+            )
+            save_metric(
+                data, out_fpath, hemi=entities["hemi"], intent="NIFTI_INTENT_SHAPE"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,21 @@
 # dependencies = [
 #     "nibabel==5.3.2",
 #     "niwrap==0.6.3",
+#     "scipy==1.15.3",
 # ]
 # ///
 
+import argparse
 import re
 import shutil
 from pathlib import Path
 
-import nibabel as nib
-from niwrap import use_docker, workbench
+if __package__:
+    from .profiling import PROFILER, add_profile_argument
+    from .symmetry import left_counterpart, mirror_gifti, mirror_permutation
+else:
+    from profiling import PROFILER, add_profile_argument
+    from symmetry import left_counterpart, mirror_gifti, mirror_permutation
 
 """Script to compute surface areas from midthickness files."""
 
@@ -22,6 +28,8 @@ HEMI_MAP = {"L": "Left", "R": "Right"}
 
 def validate_surface_area(surf_fpath: Path) -> None:
     """Validate surface file (number of vertices and hemisphere)"""
+    import nibabel as nib
+
     expected_den, expected_hemi = re.search(
         r"den-([^_]+)_?hemi-([^_]+)", surf_fpath.name
     ).groups()
@@ -45,15 +53,20 @@ def validate_surface_area(surf_fpath: Path) -> None:
         raise ValueError()
 
 
-def compute_surface_area(mid_fpath: Path) -> Path:
-    """Compute surface areas using workbench."""
-    out_dir = mid_fpath.parent
-    out_fname = mid_fpath.name.split(".")[0].replace(
+def _area_fpath(mid_fpath: Path) -> Path:
+    """Output surface area file of a midthickness surface."""
+    return mid_fpath.parent / mid_fpath.name.split(".")[0].replace(
         "midthickness", "desc-vaavg_midthickness.shape.gii"
     )
-    out_fpath = out_dir / out_fname
 
-    surf_area = workbench.surface_vertex_areas(surface=mid_fpath, metric=out_fname)
+
+def compute_surface_area(mid_fpath: Path) -> Path:
+    """Compute surface areas using workbench."""
+    from niwrap import workbench
+
+    out_fpath = _area_fpath(mid_fpath)
+
+    surf_area = workbench.surface_vertex_areas(surface=mid_fpath, metric=out_fpath.name)
     shutil.copy(surf_area.metric, out_fpath)
     if not out_fpath.exists():
         raise FileNotFoundError(f"Could not compute surface area for: {mid_fpath}")
@@ -61,18 +74,68 @@ def compute_surface_area(mid_fpath: Path) -> Path:
     return out_fpath
 
 
+def mirror_surface_area(mid_fpath: Path) -> Path | None:
+    """Mirror the left surface areas of a symmetric template, if possible."""
+    left_fpath = left_counterpart(mid_fpath)
+    if left_fpath is None or not _area_fpath(left_fpath).exists():
+        return None
+    perm = mirror_permutation(left_fpath, mid_fpath)
+    if perm is None:
+        return None
+    return mirror_gifti(_area_fpath(left_fpath), _area_fpath(mid_fpath), perm)
+
+
+def find_midthickness_files(input_dir: Path) -> list[Path]:
+    """Midthickness surfaces to compute surface areas of."""
+    # Sorted, so that left hemispheres are processed before right ones
+    return [
+        fpath
+        for fpath in sorted(input_dir.rglob("**/*midthickness*.gii"))
+        if str(fpath).endswith(("surf.gii", "rsl.gii"))
+    ]
+
+
 def main() -> None:
     """Process files."""
+    parser = argparse.ArgumentParser(
+        description="Compute surface areas from midthickness files"
+    )
+    parser.add_argument(
+        "--symmetric",
+        action="store_true",
+        help="Mirror the left hemisphere when the right one is its mirror image",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which files would be processed without processing them",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    input_dir = Path("share/Inputs")
+    if args.dry_run:
+        for fpath in find_midthickness_files(input_dir):
+            print(f"  {fpath} -> {_area_fpath(fpath).name}")
+        return
+
     # Setup niwrap to use docker
+    from niwrap import use_docker
+
     working_dir = Path("/tmp") / "styx_tmp"
     use_docker(data_dir=working_dir)
 
-    input_dir = Path("share/Inputs")
-    for fpath in input_dir.rglob("**/*midthickness*.gii"):
-        if not str(fpath).endswith(("surf.gii", "rsl.gii")):
-            continue
-        surf_fpath = compute_surface_area(mid_fpath=fpath)
-        validate_surface_area(surf_fpath)
+    with PROFILER.session(args.profile):
+        for fpath in find_midthickness_files(input_dir):
+            with PROFILER.span(fpath.parent.name, "stage"):
+                surf_fpath = (
+                    mirror_surface_area(mid_fpath=fpath) if args.symmetric else None
+                )
+                if surf_fpath is None:
+                    surf_fpath = compute_surface_area(mid_fpath=fpath)
+                else:
+                    print(f"Mirrored left hemisphere surface areas to {surf_fpath}")
+                validate_surface_area(surf_fpath)
 
     # Clean up working directory
     shutil.rmtree(working_dir)
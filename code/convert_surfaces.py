@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to convert FreeSurfer and MNI `.obj` surfaces to GIFTI.
+
+Replaces the per-file `mris_convert` and AFNI `ConvertSurface` subprocesses of
+the notebooks: both formats are parsed directly and whole directories are
+converted on a process pool.
+"""
+
+import argparse
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from surface_area.utils import detect_hemi
+from surface_utils import save_surface
+
+FS_TRIANGLE_MAGIC = b"\xff\xff\xfe"
+
+
+def read_freesurfer(fpath: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Parse a FreeSurfer binary triangle surface (e.g. `lh.white`)."""
+    buf = fpath.read_bytes()
+    if buf[:3] != FS_TRIANGLE_MAGIC:
+        raise ValueError(f"Not a FreeSurfer triangle surface: {fpath}")
+
+    # Magic number, "created by ..." line terminated by two newlines, then counts
+    offset = buf.index(b"\n\n", 3) + 2
+    n_vertices, n_faces = np.frombuffer(buf, dtype=">i4", count=2, offset=offset)
+    offset += 8
+    coords = np.frombuffer(buf, dtype=">f4", count=3 * n_vertices, offset=offset)
+    offset += coords.nbytes
+    faces = np.frombuffer(buf, dtype=">i4", count=3 * n_faces, offset=offset)
+    offset += faces.nbytes
+
+    coords = coords.reshape(-1, 3).astype(np.float64)
+    # Like `mris_convert`, move tkregister coordinates to scanner space
+    if cras := re.search(rb"cras\s*=\s*(\S+)\s+(\S+)\s+(\S+)", buf[offset:]):
+        coords += np.array([float(value) for value in cras.groups()])
+    return coords, faces.reshape(-1, 3).astype(np.int64)
+
+
+def read_mni_obj(fpath: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Parse an ASCII MNI `.obj` polygon file (e.g. CIVET surfaces)."""
+    tokens = fpath.read_bytes().split()
+    if tokens[0] != b"P":
+        raise ValueError(f"Only ASCII MNI polygon files are supported: {fpath}")
+    values = np.array(tokens[1:], dtype=np.float64)
+
+    # Surface properties (5), points, normals, items, colour flag and colours
+    n_points = int(values[5])
+    offset = 6
+    coords = values[offset : offset + 3 * n_points].reshape(-1, 3)
+    offset += 6 * n_points
+    n_items, colour_flag = int(values[offset]), int(values[offset + 1])
+    offset += 2 + 4 * {0: 1, 1: n_items, 2: n_points}[colour_flag]
+    end_indices = values[offset : offset + n_items].astype(np.int64)
+    offset += n_items
+    if np.any(np.diff(end_indices, prepend=0) != 3):
+        raise ValueError(f"Only triangulated surfaces are supported: {fpath}")
+    faces = values[offset : offset + end_indices[-1]].astype(np.int64)
+    return coords, faces.reshape(-1, 3)
+
+
+def is_freesurfer(fpath: Path) -> bool:
+    """Whether a file starts with the FreeSurfer triangle magic number."""
+    with fpath.open("rb") as fh:
+        return fh.read(3) == FS_TRIANGLE_MAGIC
+
+
+def convert_surface(in_fpath: Path, out_fpath: Path) -> Path:
+    """Convert a single FreeSurfer or MNI `.obj` surface to GIFTI."""
+    reader = read_mni_obj if in_fpath.suffix == ".obj" else read_freesurfer
+    coords, faces = reader(in_fpath)
+    hemi = detect_hemi("", in_fpath.name)
+    return save_surface(coords, faces, out_fpath, hemi=hemi)
+
+
+def find_surfaces(input_dir: Path) -> list[Path]:
+    """Find MNI `.obj` and FreeSurfer surfaces in a directory."""
+    return sorted(
+        fpath
+        for fpath in input_dir.rglob("*")
+        if fpath.is_file() and (fpath.suffix == ".obj" or is_freesurfer(fpath))
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Convert FreeSurfer and MNI .obj surfaces to GIFTI"
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        type=Path,
+        help="Surface files or directories to search for surfaces",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Output directory (default: next to each input)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of worker processes"
+    )
+    parser.add_argument(
+        "--clobber", action="store_true", help="Overwrite existing GIFTI files"
+    )
+    args = parser.parse_args()
+
+    in_fpaths = []
+    for item in args.inputs:
+        in_fpaths.extend(find_surfaces(item) if item.is_dir() else [item])
+
+    jobs = {}
+    for in_fpath in in_fpaths:
+        out_dir = args.output_dir or in_fpath.parent
+        out_fpath = out_dir / (in_fpath.name.removesuffix(".obj") + ".surf.gii")
+        if out_fpath.exists() and not args.clobber:
+            continue
+        out_dir.mkdir(parents=True, exist_ok=True)
+        jobs[in_fpath] = out_fpath
+
+    print(f"Converting {len(jobs)} surface(s)")
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(convert_surface, in_fpath, out_fpath): in_fpath
+            for in_fpath, out_fpath in jobs.items()
+        }
+        for future in as_completed(futures):
+            try:
+                print(f"✓ {futures[future]} -> {future.result()}")
+            except Exception as e:
+                print(f"✗ Failed to convert {futures[future]}: {e}")
+                failed += 1
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    exit(main())
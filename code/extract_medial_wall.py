@@ -5,18 +5,29 @@
 # dependencies = [
 #     "nibabel==5.3.2",
 #     "niwrap==0.6.3",
+#     "scipy==1.15.3",
 # ]
 # ///
 
 """Script to extract (and optionally resample) medial wall for NHP templates."""
 
+import argparse
 import shutil
 import tempfile
 from pathlib import Path
 
-import nibabel as nib
-import numpy as np
-from niwrap import use_docker, workbench
+if __package__:
+    from .mesh_cache import adjacency, mesh_topology
+    from .profiling import PROFILER, add_profile_argument
+    from .project_volumes import RibbonOperator
+    from .surface_utils import fill_holes, remove_islands, save_metric
+    from .symmetry import mirror_data, mirror_permutation
+else:
+    from mesh_cache import adjacency, mesh_topology
+    from profiling import PROFILER, add_profile_argument
+    from project_volumes import RibbonOperator
+    from surface_utils import fill_holes, remove_islands, save_metric
+    from symmetry import mirror_data, mirror_permutation
 
 HEMIS = ("L", "R")
 TPLS_MAP = {
@@ -56,6 +67,8 @@ def _save_output(src: Path, tpl_dir: Path, hemi: str) -> None:
 
 def _find_density(fpath: Path) -> int:
     """Determine the number of vertices"""
+    import nibabel as nib
+
     surf = nib.load(fpath)
     vertices = len(surf.darrays[0].data)
     return round(vertices / 1000)
@@ -63,6 +76,8 @@ def _find_density(fpath: Path) -> int:
 
 def medial_wall_from_thickness(tpl_dir: Path, tpl_surf: str) -> None:
     """Find medial wall from cortical thickness."""
+    from niwrap import workbench
+
     # Split thickness by hemisphere
     metrics = workbench.cifti_separate(
         cifti_in=tpl_dir / tpl_surf,
@@ -92,6 +107,8 @@ def medial_wall_from_thickness(tpl_dir: Path, tpl_surf: str) -> None:
 
 def medial_wall_resampled_metric(tpl_dir: Path, tpl_dict: dict[str, str]) -> None:
     """Find medial wall using resampled label."""
+    from niwrap import workbench
+
     metrics = workbench.cifti_separate(
         cifti_in=tpl_dir.parent / tpl_dict["metric"],
         direction="COLUMN",
@@ -141,6 +158,8 @@ def medial_wall_resampled_metric(tpl_dir: Path, tpl_dict: dict[str, str]) -> Non
 
 def medial_wall_from_label(tpl_dir: Path, tpl_label: str, hemi: str) -> None:
     """Find medial wall using NaN values from label."""
+    from niwrap import workbench
+
     roi = workbench.metric_math(
         expression="x==0",
         metric_out="nan.func.gii",
@@ -153,43 +172,60 @@ def medial_wall_from_label(tpl_dir: Path, tpl_label: str, hemi: str) -> None:
     _save_output(src=roi.metric_out, tpl_dir=tpl_dir, hemi=hemi)
 
 
-def medial_wall_from_volume(tpl_dir: Path, tpl_vol: str, tpl_surf: str) -> None:
-    """Infer medial wall using volume mapped to surface."""
-    for hemi in HEMIS:
-        metric = workbench.volume_to_surface_mapping(
-            volume=tpl_dir / tpl_vol,
-            surface=tpl_dir / tpl_surf.format(hemi=hemi),
-            metric_out="temp_metric.func.gii",
-            ribbon_constrained=workbench.volume_to_surface_mapping_ribbon_constrained_params(
-                inner_surf=tpl_dir
-                / tpl_surf.format(hemi=hemi).replace("midthickness", "white"),
-                outer_surf=tpl_dir / tpl_surf.format(hemi=hemi),
-                opt_interpolate_method="TRILINEAR",
-            ),
-        )
-        roi = workbench.metric_math(
-            expression="x==0",
-            metric_out="nan.func.gii",
-            var=[workbench.metric_math_var_params(name="x", metric=metric.metric_out)],
-        )
-        # Just to be sure, grab largest iisland and perform closing
-        roi = workbench.metric_remove_islands(
-            surface=tpl_dir / tpl_surf.format(hemi=hemi),
-            metric_in=roi.metric_out,
-            metric_out="wall.func.gii",
+def medial_wall_from_volume(
+    tpl_dir: Path, tpl_vol: str, tpl_surf: str, symmetric: bool = False
+) -> None:
+    """Infer medial wall using volume mapped to surface.
+
+    The volume is sampled between the white and pial surfaces with the cached
+    ribbon operator of `project_volumes`, as the projected annotations are.
+    """
+    import nibabel as nib
+    import numpy as np
+
+    img = nib.load(tpl_dir / tpl_vol)
+    data = np.asanyarray(img.dataobj).reshape(-1)
+    perm = None
+    if symmetric:
+        perm = mirror_permutation(
+            tpl_dir / tpl_surf.format(hemi="L"), tpl_dir / tpl_surf.format(hemi="R")
         )
-        roi = workbench.metric_fill_holes(
-            surface=tpl_dir / tpl_surf.format(hemi=hemi),
-            metric_in=roi.metric_out,
-            metric_out="wall_fixed.func.gii",
+        if perm is None:
+            print(f"WARNING: {tpl_dir.name} surfaces are not mirror images")
+
+    walls = {}
+    for hemi in HEMIS:
+        surf = tpl_dir / tpl_surf.format(hemi=hemi)
+        if hemi == "R" and perm is not None:
+            # Volume and surfaces are symmetric, so is the medial wall
+            walls[hemi] = mirror_data(walls["L"], perm)
+        else:
+            op = RibbonOperator.cached(
+                inner_fpath=surf.with_name(surf.name.replace("midthickness", "white")),
+                outer_fpath=surf.with_name(surf.name.replace("midthickness", "pial")),
+                img=img,
+            )
+            wall = op.project(op.sample([data]))[:, 0] == 0
+            # Just to be sure, grab largest island and perform closing
+            mesh = mesh_topology(surf)
+            adj = adjacency(mesh)
+            walls[hemi] = fill_holes(
+                remove_islands(wall, mesh["faces"], adj), mesh["faces"], adj
+            )
+
+        out_fpath = tpl_dir / OUT_FNAME.format(
+            template=tpl_dir.name, den=round(len(walls[hemi]) / 1000), hemi=hemi
         )
-        _save_output(src=roi.metric_out, tpl_dir=tpl_dir, hemi=hemi)
+        save_metric(walls[hemi], out_fpath, hemi=hemi)
 
 
 def medial_wall_from_atlas(
-    tpl_dir: Path, tpl_surf: str, tpl_vol: str, tpl_atlas: str
+    tpl_dir: Path, tpl_surf: str, tpl_vol: str, tpl_atlas: str, symmetric: bool = False
 ) -> None:
     """Infer medial wall using cortical atlas labels."""
+    import nibabel as nib
+    import numpy as np
+
     atlas_labels = list(map(int, (tpl_dir / tpl_atlas).read_text().split()))
     atlas_nii = nib.load(tpl_dir / tpl_vol)
     # Identify cortical mask
@@ -199,37 +235,79 @@ def medial_wall_from_atlas(
     with tempfile.NamedTemporaryFile(dir=tpl_dir, suffix=".nii.gz") as tmp_file:
         nib.save(mask_nii, tmp_file.name)
         medial_wall_from_volume(
-            tpl_dir=tpl_dir, tpl_vol=tmp_file.name, tpl_surf=tpl_surf
+            tpl_dir=tpl_dir,
+            tpl_vol=tmp_file.name,
+            tpl_surf=tpl_surf,
+            symmetric=symmetric,
         )
 
 
+def extraction_method(tpl_name: str, tpl_item: str | dict[str, str]) -> str:
+    """How the medial wall of a template is extracted."""
+    if isinstance(tpl_item, dict):
+        return "metric" if "metric" in tpl_item.keys() else "volume"
+    return "thickness" if "32k" in tpl_name else "label"
+
+
 def main() -> None:
-    # Setup niwrap to use docker
+    parser = argparse.ArgumentParser(
+        description="Extract the medial wall of NHP templates"
+    )
+    parser.add_argument(
+        "--symmetric",
+        action="store_true",
+        help=(
+            "Mirror the left hemisphere when the surfaces are mirror images "
+            "(the volume must be symmetric as well)"
+        ),
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which templates would be processed without processing them",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
     input_dir = Path("share/Inputs")
+    if args.dry_run:
+        for tpl_name, tpl_item in TPLS_MAP.items():
+            tpl_dir = input_dir / tpl_name.split("_")[0]
+            method = extraction_method(tpl_name, tpl_item)
+            print(f"  {tpl_name}: from {method} -> {tpl_dir}")
+        return
+
+    # Setup niwrap to use docker
+    from niwrap import use_docker
+
     working_dir = Path("/tmp/styx_tmp")
     use_docker(data_dir=working_dir)
 
-    # Extract medial wall
-    for tpl_name, tpl_item in TPLS_MAP.items():
-        tpl_dir = input_dir / tpl_name.split("_")[0]
+    with PROFILER.session(args.profile):
+        # Extract medial wall
+        for tpl_name, tpl_item in TPLS_MAP.items():
+            tpl_dir = input_dir / tpl_name.split("_")[0]
 
-        if isinstance(tpl_item, dict):
-            if "metric" in tpl_item.keys():
-                medial_wall_resampled_metric(tpl_dir=tpl_dir, tpl_dict=tpl_item)
-            else:
-                medial_wall_from_volume(
-                    tpl_dir=tpl_dir, tpl_vol=tpl_item["vol"], tpl_surf=tpl_item["surf"]
-                )
-        else:
-            if "32k" in tpl_name:
-                medial_wall_from_thickness(tpl_dir=tpl_dir, tpl_surf=tpl_item)
-            else:
-                for hemi in HEMIS:
-                    medial_wall_from_label(
+            with PROFILER.span(tpl_name, "stage"):
+                method = extraction_method(tpl_name, tpl_item)
+                if method == "metric":
+                    medial_wall_resampled_metric(tpl_dir=tpl_dir, tpl_dict=tpl_item)
+                elif method == "volume":
+                    medial_wall_from_volume(
                         tpl_dir=tpl_dir,
-                        tpl_label=tpl_item,
-                        hemi="lh" if hemi == "L" else "rh",
+                        tpl_vol=tpl_item["vol"],
+                        tpl_surf=tpl_item["surf"],
+                        symmetric=args.symmetric,
                     )
+                elif method == "thickness":
+                    medial_wall_from_thickness(tpl_dir=tpl_dir, tpl_surf=tpl_item)
+                else:
+                    for hemi in HEMIS:
+                        medial_wall_from_label(
+                            tpl_dir=tpl_dir,
+                            tpl_label=tpl_item,
+                            hemi="lh" if hemi == "L" else "rh",
+                        )
 
     # Clean up working directory
     shutil.rmtree(working_dir)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to generate inflated and spherical surfaces without FreeSurfer.
+
+Replaces `wb_command -surface-average`, `mris_inflate` and `mris_sphere`:
+surfaces are averaged, inflated by iterative Laplacian smoothing with total
+area preserved, then projected to a sphere, relaxed until no triangle is folded
+and finally relaxed towards the triangle areas of the midthickness, minimizing
+areal distortion without folding any triangle. Hemispheres are processed in
+parallel.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from surface_utils import (
+    adjacency_matrix,
+    load_surface,
+    mesh_orientation,
+    save_surface,
+)
+
+HEMI_MAP = {"lh": "L", "rh": "R", "L": "L", "R": "R"}
+SPHERE_RADIUS = 100.0
+# Stop the area relaxation once the distortion improves by less than this
+DISTORTION_TOL = 1e-4
+# Retries of a relaxation step, freezing the vertices of the triangles it folds
+MAX_FREEZES = 20
+
+
+def surface_area(coords: np.ndarray, faces: np.ndarray) -> float:
+    """Total area of a triangle mesh."""
+    return face_areas(coords, faces).sum()
+
+
+def smoothing_operator(adj: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Row-normalised adjacency, i.e. the mean of each vertex's neighbours."""
+    degree = np.asarray(adj.sum(axis=1)).ravel()
+    return (sparse.diags(1.0 / np.maximum(degree, 1)) @ adj).tocsr()
+
+
+def face_areas(coords: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Area of each triangle."""
+    v0, v1, v2 = (coords[faces[:, i]] for i in range(3))
+    return 0.5 * np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+
+
+def folded_mask(
+    coords: np.ndarray, faces: np.ndarray, orientation: float
+) -> np.ndarray:
+    """Triangles whose normal points towards the sphere centre."""
+    v0, v1, v2 = (coords[faces[:, i]] for i in range(3))
+    normals = np.cross(v1 - v0, v2 - v0)
+    return orientation * np.einsum("ij,ij->i", normals, v0 + v1 + v2) < 0
+
+
+def folded_faces(coords: np.ndarray, faces: np.ndarray, orientation: float) -> int:
+    """Number of triangles whose normal points towards the sphere centre."""
+    return int(folded_mask(coords, faces, orientation).sum())
+
+
+def surface_average(fpaths: list[Path]) -> tuple[np.ndarray, np.ndarray]:
+    """Vertex-wise average of surfaces sharing the same topology."""
+    meshes = [load_surface(fpath) for fpath in fpaths]
+    if len({coords.shape for coords, _ in meshes}) != 1:
+        raise ValueError(f"Surfaces do not share the same topology: {fpaths}")
+    return np.mean([coords for coords, _ in meshes], axis=0), meshes[0][1]
+
+
+def inflate(
+    coords: np.ndarray,
+    faces: np.ndarray,
+    iterations: int = 100,
+    step: float = 0.5,
+    smooth: sparse.csr_matrix | None = None,
+) -> np.ndarray:
+    """Laplacian inflation, rescaled after each step to keep the total area."""
+    if smooth is None:
+        smooth = smoothing_operator(adjacency_matrix(faces, len(coords)))
+    target_area = surface_area(coords, faces)
+    centre = coords.mean(axis=0)
+    inflated = coords - centre
+    for _ in range(iterations):
+        inflated += step * (smooth @ inflated - inflated)
+        inflated *= np.sqrt(target_area / surface_area(inflated, faces))
+    return inflated + centre
+
+
+def relax_areas(
+    sphere: np.ndarray,
+    faces: np.ndarray,
+    target_areas: np.ndarray,
+    orientation: float,
+    iterations: int = 200,
+    diffusion: float = 80.0,
+    step: float = 0.5,
+) -> np.ndarray:
+    """Move vertices on the sphere so that triangle areas approach their targets.
+
+    Density-equalizing flow: the density (target over current area) is smoothed
+    over the mesh and vertices follow minus its gradient, growing the triangles
+    that are too small and shrinking the others. Steps move vertices by at most
+    `step` edge lengths, leaving in place those of the triangles they would fold.
+    """
+    n_vertices, n_faces = len(sphere), len(faces)
+    incidence = sparse.csr_matrix(
+        (np.ones(3 * n_faces), (faces.ravel(), np.repeat(np.arange(n_faces), 3))),
+        shape=(n_vertices, n_faces),
+    )
+    adj = adjacency_matrix(faces, n_vertices)
+    laplacian = sparse.diags(np.asarray(adj.sum(axis=1)).ravel()) - adj
+    smooth = splu((sparse.identity(n_vertices) + diffusion * laplacian).tocsc())
+    target = target_areas / target_areas.sum()
+    edge = np.linalg.norm(sphere[faces[:, 1]] - sphere[faces[:, 0]], axis=1).mean()
+
+    best, best_distortion = sphere, np.inf
+    for _ in range(iterations):
+        v0, v1, v2 = (sphere[faces[:, i]] for i in range(3))
+        cross = np.cross(v1 - v0, v2 - v0)
+        areas = 0.5 * np.linalg.norm(cross, axis=1)
+        density = target / np.maximum(areas / areas.sum(), 1e-12)
+        distortion = float(np.mean(np.abs(np.log2(density))))
+        if distortion > best_distortion - DISTORTION_TOL:
+            break
+        best, best_distortion = sphere, distortion
+
+        # Smoothed vertex density and its (piecewise linear) gradient per face
+        vertex_areas = incidence @ areas
+        rho = smooth.solve(incidence @ (areas * density) / vertex_areas)
+        normals = cross / np.maximum(2 * areas, 1e-12)[:, None]
+        grad = (
+            rho[faces[:, 0], None] * np.cross(normals, v2 - v1)
+            + rho[faces[:, 1], None] * np.cross(normals, v0 - v2)
+            + rho[faces[:, 2], None] * np.cross(normals, v1 - v0)
+        ) / np.maximum(2 * areas, 1e-12)[:, None]
+        velocity = -(incidence @ (areas[:, None] * grad))
+        velocity /= (vertex_areas * rho)[:, None]
+        # Tangential, and scaled so that the fastest vertex moves an edge length
+        radial = sphere / SPHERE_RADIUS
+        velocity -= np.einsum("ij,ij->i", velocity, radial)[:, None] * radial
+        velocity *= edge / max(np.abs(velocity).max(), 1e-12)
+
+        # Vertices of the triangles a step would fold stay in place
+        for _ in range(MAX_FREEZES):
+            moved = sphere + step * velocity
+            moved *= SPHERE_RADIUS / np.linalg.norm(moved, axis=1, keepdims=True)
+            folded = folded_mask(moved, faces, orientation)
+            if not folded.any():
+                break
+            velocity[faces[folded].ravel()] = 0.0
+        else:
+            break
+        sphere = moved
+    return best
+
+
+def spherize(
+    coords: np.ndarray,
+    faces: np.ndarray,
+    min_iterations: int = 50,
+    max_iterations: int = 1000,
+    step: float = 0.5,
+    smooth: sparse.csr_matrix | None = None,
+    target_areas: np.ndarray | None = None,
+) -> np.ndarray:
+    """Project onto a sphere, unfold, then minimize areal distortion.
+
+    Triangles are first relaxed tangentially until none is folded, then towards
+    `target_areas` (by default the triangle areas of `coords`).
+    """
+    if smooth is None:
+        smooth = smoothing_operator(adjacency_matrix(faces, len(coords)))
+    if target_areas is None:
+        target_areas = face_areas(coords, faces)
+    # From the input mesh, as projected triangles can be folded either way
+    orientation = mesh_orientation(coords, faces)
+    sphere = coords - coords.mean(axis=0)
+    sphere *= SPHERE_RADIUS / np.linalg.norm(sphere, axis=1, keepdims=True)
+
+    for itr in range(max_iterations):
+        sphere += step * (smooth @ sphere - sphere)
+        sphere *= SPHERE_RADIUS / np.linalg.norm(sphere, axis=1, keepdims=True)
+        if itr + 1 >= min_iterations and not folded_faces(sphere, faces, orientation):
+            break
+    else:
+        print(
+            f"WARNING: {folded_faces(sphere, faces, orientation)} folded triangle(s) "
+            f"left after {max_iterations} iterations"
+        )
+        return sphere
+    return relax_areas(sphere, faces, target_areas, orientation)
+
+
+def areal_distortion(
+    coords: np.ndarray, sphere: np.ndarray, faces: np.ndarray
+) -> float:
+    """Mean absolute log2 ratio of (normalised) triangle areas."""
+    ratios = []
+    for surf in (coords, sphere):
+        v0, v1, v2 = (surf[faces[:, i]] for i in range(3))
+        areas = np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+        ratios.append(areas / areas.sum())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = np.log2(ratios[1] / ratios[0])
+    return float(np.nanmean(np.abs(log_ratio[np.isfinite(log_ratio)])))
+
+
+def prepare_hemisphere(
+    hemi: str,
+    midthickness: Path,
+    inflated: Path,
+    sphere: Path,
+    average: list[Path],
+    iterations: int,
+) -> None:
+    """Average (optional), inflate and spherize a single hemisphere."""
+    hemi_label = HEMI_MAP[hemi]
+    if average:
+        print(f"[AVERAGING] {', '.join(fpath.name for fpath in average)}")
+        coords, faces = surface_average(average)
+        save_surface(coords, faces, midthickness, hemi=hemi_label)
+    else:
+        coords, faces = load_surface(midthickness)
+
+    # Inflated and spherical surfaces share the midthickness topology
+    smooth = smoothing_operator(adjacency_matrix(faces, len(coords)))
+    print(f"[INFLATING] {midthickness.name} (iterations={iterations})")
+    inflated_coords = inflate(coords, faces, iterations=iterations, smooth=smooth)
+    save_surface(inflated_coords, faces, inflated, hemi=hemi_label, geometry="Inflated")
+
+    print(f"[SPHERIZING] {inflated.name}")
+    sphere_coords = spherize(
+        inflated_coords, faces, smooth=smooth, target_areas=face_areas(coords, faces)
+    )
+    save_surface(sphere_coords, faces, sphere, hemi=hemi_label, geometry="Spherical")
+    print(
+        f"Sphere saved to {sphere} "
+        f"(areal distortion={areal_distortion(coords, sphere_coords, faces):.3f})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate inflated and spherical surfaces from a midthickness",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Paths are templates, where `{hemi}` is replaced by each of `--hemis`.
+
+Examples:
+  python inflate_surfaces.py \\
+    --midthickness "{hemi}.MEBRAINS.mid.surf.gii" \\
+    --average "{hemi}.MEBRAINS.pial.surf.gii" "{hemi}.MEBRAINS.smoothwm.surf.gii" \\
+    --inflated "{hemi}.MEBRAINS.inflated.surf.gii" \\
+    --sphere "{hemi}.MEBRAINS.sphere.surf.gii"
+        """,
+    )
+    parser.add_argument("--midthickness", required=True, help="Midthickness surface")
+    parser.add_argument("--inflated", required=True, help="Output inflated surface")
+    parser.add_argument("--sphere", required=True, help="Output spherical surface")
+    parser.add_argument(
+        "--average",
+        nargs="+",
+        default=[],
+        help="Surfaces to average into the midthickness before inflating",
+    )
+    parser.add_argument(
+        "--hemis",
+        nargs="+",
+        default=["lh", "rh"],
+        choices=HEMI_MAP.keys(),
+        help="Hemisphere labels substituted for {hemi} (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-n",
+        "--iterations",
+        type=int,
+        default=100,
+        help="Number of inflation iterations (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=len(args.hemis)) as pool:
+        futures = [
+            pool.submit(
+                prepare_hemisphere,
+                hemi=hemi,
+                midthickness=Path(args.midthickness.format(hemi=hemi)),
+                inflated=Path(args.inflated.format(hemi=hemi)),
+                sphere=Path(args.sphere.format(hemi=hemi)),
+                average=[Path(fpath.format(hemi=hemi)) for fpath in args.average],
+                iterations=args.iterations,
+            )
+            for hemi in args.hemis
+        ]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    main()
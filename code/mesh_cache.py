@@ -0,0 +1,97 @@
+"""Per-surface cache of the mesh quantities shared by the pipeline stages.
+
+Coordinates, triangles, vertex adjacency and the areas and normals of
+faces and vertices are derived once per surface content and stored as compact
+int32/float32 `.npy` files in `share/.cache/mesh_<hash>/`. They are loaded
+memory mapped (read-only), so stages share them without decoding the GIFTI or
+recomputing them, and only the pages they touch are read.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+if __package__:
+    from .surface_utils import (
+        CACHE_DIR,
+        adjacency_matrix,
+        content_hash,
+        load_surface,
+        vertex_areas,
+        vertex_normals,
+    )
+else:
+    from surface_utils import (
+        CACHE_DIR,
+        adjacency_matrix,
+        content_hash,
+        load_surface,
+        vertex_areas,
+        vertex_normals,
+    )
+
+MESH_ARRAYS = (
+    "coords",
+    "faces",
+    "adj_indptr",
+    "adj_indices",
+    "face_areas",
+    "face_normals",
+    "vertex_areas",
+    "vertex_normals",
+)
+
+
+def build_topology(coords: np.ndarray, faces: np.ndarray) -> dict[str, np.ndarray]:
+    """Compute the cached quantities of a triangle mesh."""
+    cross = np.cross(
+        coords[faces[:, 1]] - coords[faces[:, 0]],
+        coords[faces[:, 2]] - coords[faces[:, 0]],
+    )
+    norms = np.linalg.norm(cross, axis=1)
+    adj = adjacency_matrix(faces, len(coords))
+    adj.sort_indices()
+
+    return {
+        "coords": coords.astype(np.float32),
+        "faces": faces.astype(np.int32),
+        "adj_indptr": adj.indptr.astype(np.int32),
+        "adj_indices": adj.indices.astype(np.int32),
+        "face_areas": (0.5 * norms).astype(np.float32),
+        "face_normals": (cross / np.where(norms > 0, norms, 1.0)[:, None]).astype(
+            np.float32
+        ),
+        "vertex_areas": vertex_areas(coords, faces).astype(np.float32),
+        "vertex_normals": vertex_normals(coords, faces).astype(np.float32),
+    }
+
+
+def mesh_topology(fpath: Path) -> dict[str, np.ndarray]:
+    """Memory-mapped mesh quantities of a surface file, computed on first use."""
+    cache_dir = CACHE_DIR / f"mesh_{content_hash(fpath)}"
+    if not cache_dir.exists():
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".mesh_", dir=CACHE_DIR))
+        for name, array in build_topology(*load_surface(fpath)).items():
+            np.save(tmp_dir / f"{name}.npy", array)
+        try:
+            # Readers only ever see complete directories
+            tmp_dir.rename(cache_dir)
+        except OSError:
+            # Built concurrently by another stage
+            shutil.rmtree(tmp_dir)
+    return {
+        name: np.load(cache_dir / f"{name}.npy", mmap_mode="r") for name in MESH_ARRAYS
+    }
+
+
+def adjacency(mesh: dict[str, np.ndarray]) -> sparse.csr_matrix:
+    """Binary (vertices, vertices) adjacency matrix of a cached mesh."""
+    indices, indptr = mesh["adj_indices"], mesh["adj_indptr"]
+    n_vertices = len(indptr) - 1
+    return sparse.csr_matrix(
+        (np.ones(len(indices)), indices, indptr), shape=(n_vertices, n_vertices)
+    )
@@ -1,3 +1,4 @@
+code_dir=$(dirname "$0")
 
 ##############
 ## MEBRAINS ##
@@ -19,16 +20,12 @@ inflated_right_surf="${dir}/rh.MEBRAINS.inflated.surf.gii"
 sphere_left_surf="${dir}/lh.MEBRAINS.sphere.surf.gii"
 sphere_right_surf="${dir}/rh.MEBRAINS.sphere.surf.gii"
 
-if [[ ! -f $sphere_left_surf ]]; then
-	wb_command -surface-average $mid_left_surf  -surf $pial_left_surf -surf $wm_left_surf
-	mris_inflate -n 100  $mid_left_surf $inflated_left_surf
-	mris_sphere -q  $inflated_left_surf $sphere_left_surf
-fi 
-
-if [[ ! -f $sphere_right_surf ]]; then
-	wb_command -surface-average $mid_right_surf  -surf $pial_right_surf -surf $wm_right_surf
-	mris_inflate -n 100  $mid_right_surf $inflated_right_surf
-	mris_sphere -q  $inflated_right_surf $sphere_right_surf
+if [[ ! -f $sphere_left_surf || ! -f $sphere_right_surf ]]; then
+	python3 ${code_dir}/inflate_surfaces.py -n 100 \
+		--midthickness "${dir}/{hemi}.MEBRAINS.mid.surf.gii" \
+		--average "${dir}/{hemi}.MEBRAINS.pial.surf.gii" "${dir}/{hemi}.MEBRAINS.smoothwm.surf.gii" \
+		--inflated "${dir}/{hemi}.MEBRAINS.inflated.surf.gii" \
+		--sphere "${dir}/{hemi}.MEBRAINS.sphere.surf.gii"
 fi
 
 ##############
@@ -46,15 +43,11 @@ sphere_left_surf="${dir}/NMT_v2.0_sym_lh.sphere_surface.rsl.gii"
 sphere_right_surf="${dir}/NMT_v2.0_sym_rh.sphere_surface.rsl.gii"
 
 
-if [[ ! -f  $sphere_left_surf ]]; then
-	mris_inflate -n 100 ${mid_left_surf} $inflated_left_surf 
-	mris_sphere -q  ${inflated_left_surf} $sphere_left_surf 
-fi 
-
-if [[ ! -f $sphere_right_surf ]]; then
-	mris_inflate -n 100 ${mid_right_surf} $inflated_right_surf 
-	mris_sphere -q  ${inflated_right_surf} $sphere_right_surf 
-	mv /tmp/tmp.surf.gii $sphere_right_surf 
+if [[ ! -f $sphere_left_surf || ! -f $sphere_right_surf ]]; then
+	python3 ${code_dir}/inflate_surfaces.py -n 100 \
+		--midthickness "${dir}/NMT_v2.0_sym_{hemi}.mid_surface.rsl.gii" \
+		--inflated "${dir}/NMT_v2.0_sym_{hemi}.inflated_surface.rsl.gii" \
+		--sphere "${dir}/NMT_v2.0_sym_{hemi}.sphere_surface.rsl.gii"
 fi
 
 
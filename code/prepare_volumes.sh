@@ -1,6 +1,7 @@
+code_dir=$(dirname "$0")
 
 # Create symmetric version of the D99 atlas
 if [[ ! -f "data/d99/volumes/D99_atlas_v2.0_sym.nii.gz" ]] ; then
 
-    python3 fliplr.py  "data/d99/volumes/D99_atlas_v2.0_right.nii.gz" "data/d99/volumes/D99_atlas_v2.0_sym.nii.gz"
+    python3 ${code_dir}/symmetrize_volume.py --mode fill "data/d99/volumes/D99_atlas_v2.0_right.nii.gz" "data/d99/volumes/D99_atlas_v2.0_sym.nii.gz"
 fi
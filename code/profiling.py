@@ -0,0 +1,291 @@
+"""Timing and resource instrumentation for the pipeline scripts.
+
+Within a profiling session (`--profile`), every niwrap call, `nib.load` /
+`nib.save` and `shutil.copy` is recorded with its wall time, change in resident
+memory, the process high-water mark and bytes read/written. Results are written
+as a Chrome trace (open in `chrome://tracing` or Perfetto) and summarised per
+stage, and the instrumented functions are restored when the session ends.
+"""
+
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _maxrss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """High-water mark of the resident set size over the lifetime of the process.
+
+    ru_maxrss is in KB on Linux, bytes on macOS.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process (Linux only)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except OSError:
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+def _io_bytes() -> tuple[int, int]:
+    """Bytes read and written by this process so far (Linux only)."""
+    try:
+        counters = dict(
+            line.split(": ") for line in Path("/proc/self/io").read_text().splitlines()
+        )
+    except OSError:
+        return 0, 0
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def _file_size(fpath: object) -> int:
+    """Size of a file (or all files in a directory), 0 if missing."""
+    fpath = Path(str(fpath))
+    if fpath.is_dir():
+        return sum(f.stat().st_size for f in fpath.rglob("*") if f.is_file())
+    return fpath.stat().st_size if fpath.exists() else 0
+
+
+class _ProfiledExecution:
+    """Wrap a styx execution to time file staging and the container run."""
+
+    def __init__(self, execution, name: str, profiler: "Profiler") -> None:
+        self._execution = execution
+        self._name = name
+        self._profiler = profiler
+        self._staging = 0.0
+        self._inputs = []
+        self._outputs = []
+
+    def __getattr__(self, name: str):
+        return getattr(self._execution, name)
+
+    def input_file(self, host_file, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._execution.input_file(host_file, *args, **kwargs)
+        finally:
+            self._inputs.append(host_file)
+            self._staging += time.perf_counter() - start
+
+    def output_file(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            out = self._execution.output_file(*args, **kwargs)
+            self._outputs.append(out)
+            return out
+        finally:
+            self._staging += time.perf_counter() - start
+
+    def run(self, *args, **kwargs):
+        with self._profiler.span(self._name, "workbench") as record:
+            self._execution.run(*args, **kwargs)
+        # Container I/O is invisible to this process; use the staged files instead
+        record["staging_s"] = self._staging
+        record["read_bytes"] = sum(map(_file_size, self._inputs))
+        record["write_bytes"] = sum(map(_file_size, self._outputs))
+
+
+class _ProfiledRunner:
+    """Wrap a styx runner so that every execution is profiled."""
+
+    def __init__(self, runner, profiler: "Profiler") -> None:
+        self._runner = runner
+        self._profiler = profiler
+
+    def __getattr__(self, name: str):
+        return getattr(self._runner, name)
+
+    def start_execution(self, metadata):
+        return _ProfiledExecution(
+            self._runner.start_execution(metadata),
+            name=getattr(metadata, "name", "niwrap"),
+            profiler=self._profiler,
+        )
+
+
+class Profiler:
+    """Collect timed spans and export them as a trace and a summary table."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.trace_fpath = None
+        self.events = []
+        self._origin = time.perf_counter()
+        self._stage = threading.local()
+
+    @contextmanager
+    def session(self, trace_fpath: Path | None):
+        """Record the enclosed block, instrumenting I/O and the niwrap runner.
+
+        Does nothing if `trace_fpath` is None. The original functions and runner
+        are restored on exit, after writing the report.
+        """
+        if trace_fpath is None:
+            yield self
+            return
+
+        import nibabel as nib
+
+        originals = [(nib, "load"), (nib, "save"), (shutil, "copy")]
+        originals = [(obj, name, getattr(obj, name)) for obj, name in originals]
+        try:
+            import niwrap
+        except ImportError:
+            niwrap = None
+        runner = niwrap.get_global_runner() if niwrap is not None else None
+
+        self.enabled = True
+        self.trace_fpath = trace_fpath
+        for obj, name, func in originals:
+            setattr(obj, name, self.wrap(func, name))
+        if niwrap is not None:
+            niwrap.set_global_runner(_ProfiledRunner(runner, self))
+        try:
+            yield self
+        finally:
+            for obj, name, func in originals:
+                setattr(obj, name, func)
+            if niwrap is not None:
+                niwrap.set_global_runner(runner)
+            self.report()
+            self.enabled = False
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        """Record the enclosed block; yields a dict to attach extra values to."""
+        record = dict(args)
+        if not self.enabled:
+            yield record
+            return
+
+        if cat == "stage":
+            self._stage.name = name
+        start = time.perf_counter()
+        read0, write0 = _io_bytes()
+        rss0 = _rss_mb()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            read1, write1 = _io_bytes()
+            record.setdefault("read_bytes", read1 - read0)
+            record.setdefault("write_bytes", write1 - write0)
+            record["rss_delta_mb"] = _rss_mb() - rss0
+            record["maxrss_mb"] = _maxrss_mb()
+            record["maxrss_children_mb"] = _maxrss_mb(resource.RUSAGE_CHILDREN)
+            record["stage"] = getattr(self._stage, "name", None)
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": record,
+                }
+            )
+            if cat == "stage":
+                self._stage.name = None
+
+    def wrap(self, func, cat: str):
+        """Decorate `func` so that each call is recorded as a span."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = Path(str(args[0])).name if args else func.__name__
+            with self.span(name, cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def summary(self) -> str:
+        """Per-stage table of time spent by category and resource usage."""
+        cats = ("workbench", "load", "save", "copy")
+        rows = defaultdict(lambda: defaultdict(float))
+        for event in self.events:
+            row = rows[event["args"]["stage"] or "-"]
+            if event["cat"] == "stage":
+                row["wall"] += event["dur"] / 1e6
+                continue
+            row[event["cat"]] += event["dur"] / 1e6
+            row["read_mb"] += event["args"]["read_bytes"] / 1024**2
+            row["write_mb"] += event["args"]["write_bytes"] / 1024**2
+            row["staging"] += event["args"].get("staging_s", 0.0)
+            row["rss_delta_mb"] = max(
+                row["rss_delta_mb"], event["args"]["rss_delta_mb"]
+            )
+            row["maxrss_mb"] = max(row["maxrss_mb"], event["args"]["maxrss_mb"])
+
+        # The fastest container run approximates the fixed start-up cost
+        runs = [e["dur"] / 1e6 for e in self.events if e["cat"] == "workbench"]
+        startup = min(runs, default=0.0)
+        for event in self.events:
+            if event["cat"] == "workbench":
+                rows[event["args"]["stage"] or "-"]["overhead"] += startup
+
+        header = [
+            "stage",
+            "wall",
+            *cats,
+            "overhead",
+            "read_mb",
+            "write_mb",
+            "drss_mb",
+            "maxrss_mb",
+        ]
+        lines = [" | ".join(f"{h:>10}" for h in header)]
+        for stage, row in rows.items():
+            values = [row["wall"], *(row[c] for c in cats)]
+            values.append(row["overhead"] + row["staging"])
+            values.extend((row["read_mb"], row["write_mb"]))
+            values.extend((row["rss_delta_mb"], row["maxrss_mb"]))
+            lines.append(
+                " | ".join([f"{stage[:10]:>10}", *(f"{v:>10.2f}" for v in values)])
+            )
+        lines.append(
+            f"(times in s; overhead = staging + {startup:.2f}s estimated container "
+            "start-up per workbench call; drss = largest change in resident memory "
+            "over a call, maxrss = process high-water mark)"
+        )
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        """Write the Chrome trace and print the per-stage summary."""
+        if not self.enabled:
+            return
+        self.trace_fpath.write_text(
+            json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"})
+        )
+        print(f"\n{self.summary()}")
+        print(f"Trace saved to {self.trace_fpath}")
+
+
+PROFILER = Profiler()
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the `--profile [TRACE]` option to a script's parser."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=Path,
+        const=Path("profile.json"),
+        default=None,
+        metavar="TRACE",
+        help="Record timings and resources to a Chrome trace (default: %(const)s)",
+    )
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to project volumetric annotations onto template surfaces.
+
+A sparse voxel-to-vertex operator encoding the ribbon-constrained sampling
+weights is built once per (surface pair, volume grid) and cached, so that every
+volume sharing a grid is projected with a single sparse multiplication.
+"""
+
+import itertools as it
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from scipy import sparse
+
+if __package__:
+    from .mesh_cache import mesh_topology
+    from .surface_utils import (
+        CACHE_DIR,
+        HEMIS,
+        content_hash,
+        read_lut,
+        save_label,
+        save_metric,
+        weighted_mode,
+    )
+else:
+    from mesh_cache import mesh_topology
+    from surface_utils import (
+        CACHE_DIR,
+        HEMIS,
+        content_hash,
+        read_lut,
+        save_label,
+        save_metric,
+        weighted_mode,
+    )
+
+RIBBON_STEPS = 5
+CORNERS = np.array(list(it.product((0, 1), repeat=3)))
+SPACES_MAP = {
+    "D99": {
+        "inner": "src-D99_den-41k_hemi-{hemi}_white.surf.gii",
+        "outer": "src-D99_den-41k_hemi-{hemi}_pial.surf.gii",
+    },
+    "NMT2Sym": {
+        "inner": "src-NMT2Sym_den-41k_hemi-{hemi}_white.rsl.gii",
+        "outer": "src-NMT2Sym_den-41k_hemi-{hemi}_pial.rsl.gii",
+    },
+}
+
+
+class RibbonOperator:
+    """Sparse ribbon-constrained mapping from the voxels of a grid to vertices."""
+
+    def __init__(self, weights: sparse.csr_matrix, voxels: np.ndarray) -> None:
+        # Columns of `weights` only span the voxels touched by the ribbon
+        self.weights = weights
+        self.voxels = voxels
+
+    @classmethod
+    def build(
+        cls,
+        inner: np.ndarray,
+        outer: np.ndarray,
+        shape: tuple[int, ...],
+        affine: np.ndarray,
+        steps: int = RIBBON_STEPS,
+    ) -> "RibbonOperator":
+        """Sample `steps` points between the surfaces with trilinear weights."""
+        n_vertices = inner.shape[0]
+        frac = (np.arange(steps) + 0.5) / steps
+        points = inner[:, None, :] + frac[None, :, None] * (outer - inner)[:, None, :]
+        ijk = nib.affines.apply_affine(np.linalg.inv(affine), points)
+
+        base = np.floor(ijk).astype(np.int64)
+        offset = ijk - base
+        idx = base[:, :, None, :] + CORNERS
+        weights = np.prod(
+            np.where(CORNERS, offset[:, :, None, :], 1 - offset[:, :, None, :]), axis=-1
+        )
+        valid = np.all((idx >= 0) & (idx < np.asarray(shape[:3])), axis=-1)
+        valid &= weights > 0
+
+        rows = np.broadcast_to(np.arange(n_vertices)[:, None, None], valid.shape)[valid]
+        cols = np.ravel_multi_index(tuple(idx[valid].T), shape[:3])
+        voxels, cols = np.unique(cols, return_inverse=True)
+        mat = sparse.csr_matrix(
+            (weights[valid], (rows, cols)), shape=(n_vertices, len(voxels))
+        )
+
+        # Renormalise so that samples falling outside of the grid are ignored
+        totals = np.asarray(mat.sum(axis=1)).ravel()
+        scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+        return cls(weights=(sparse.diags(scale) @ mat).tocsr(), voxels=voxels)
+
+    @classmethod
+    def cached(
+        cls, inner_fpath: Path, outer_fpath: Path, img: nib.Nifti1Image
+    ) -> "RibbonOperator":
+        """Load the operator for a surface pair and grid, building it if needed."""
+        shape, affine = img.shape[:3], img.affine
+        key = content_hash(
+            inner_fpath, outer_fpath, shape, affine.round(6), RIBBON_STEPS
+        )
+        cache_fpath = CACHE_DIR / f"ribbon_{key}.npz"
+        if cache_fpath.exists():
+            with np.load(cache_fpath) as npz:
+                weights = sparse.csr_matrix(
+                    (npz["data"], npz["indices"], npz["indptr"]),
+                    shape=tuple(npz["shape"]),
+                )
+                return cls(weights=weights, voxels=npz["voxels"])
+
+        print(f"[OPERATOR] {inner_fpath.name} -> {outer_fpath.name} (grid={shape})")
+        op = cls.build(
+            inner=np.asarray(mesh_topology(inner_fpath)["coords"], dtype=np.float64),
+            outer=np.asarray(mesh_topology(outer_fpath)["coords"], dtype=np.float64),
+            shape=shape,
+            affine=affine,
+        )
+        cache_fpath.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            cache_fpath,
+            data=op.weights.data,
+            indices=op.weights.indices,
+            indptr=op.weights.indptr,
+            shape=op.weights.shape,
+            voxels=op.voxels,
+        )
+        return op
+
+    def sample(self, volumes: list[np.ndarray]) -> np.ndarray:
+        """Gather ribbon voxels of flattened volumes into a (voxels, volumes) array."""
+        return np.column_stack([vol[self.voxels] for vol in volumes])
+
+    def project(self, values: np.ndarray) -> np.ndarray:
+        """Weighted average of (stacked) voxel values at every vertex."""
+        return self.weights @ values
+
+    def project_labels(self, values: np.ndarray) -> np.ndarray:
+        """Weighted mode of voxel labels at every vertex."""
+        return weighted_mode(self.weights, values)
+
+
+def is_label(vol_fpath: Path) -> bool:
+    """Whether a volume holds discrete labels rather than continuous values."""
+    return "desc-AT" in vol_fpath.name or vol_fpath.name.endswith("_mask.nii.gz")
+
+
+def out_fname(vol_fpath: Path, den: str, hemi: str) -> str:
+    """Surface file name for a projected volume, e.g. `src-X_den-41k_hemi-L_...`.
+
+    Every other entity of the volume is kept (`space-sym` included), and the
+    hemisphere of a one-hemisphere volume becomes `volhemi-`, so that it is not
+    confused with the projection of the whole-brain volume.
+    """
+    space, rest = re.match(r"src-([^_]+)_(.+)\.nii(?:\.gz)?$", vol_fpath.name).groups()
+    rest = re.sub(r"(^|_)hemi-", r"\1volhemi-", rest)
+    ext = "label.gii" if is_label(vol_fpath) else "func.gii"
+    return f"src-{space}_den-{den}_hemi-{hemi}_{rest}.{ext}"
+
+
+def out_fpaths(
+    vols: list[Path], annot_dir: Path, out_dir: Path, den: str, hemi: str
+) -> dict[Path, Path]:
+    """Output path of each volume, keeping its sub-directory of `annot_dir`."""
+    fpaths, sources = {}, {}
+    for vol_fpath in vols:
+        fpath = (
+            out_dir
+            / vol_fpath.parent.relative_to(annot_dir)
+            / out_fname(vol_fpath, den, hemi)
+        )
+        if fpath in sources:
+            raise ValueError(
+                f"{sources[fpath].name} and {vol_fpath.name} both project to {fpath}"
+            )
+        fpaths[vol_fpath], sources[fpath] = fpath, vol_fpath
+    return fpaths
+
+
+def project_space(
+    input_dir: Path, annot_dir: Path, out_dir: Path, space: str, surfs: dict
+) -> None:
+    """Project all volumes of a space, grouping them by voxel grid."""
+    grids = defaultdict(list)
+    vol_fpaths = sorted(annot_dir.rglob("*.nii*"))
+    for vol_fpath in vol_fpaths:
+        img = nib.load(vol_fpath)
+        grids[(img.shape[:3], img.affine.round(6).tobytes())].append((vol_fpath, img))
+
+    # Output paths of every volume covering each hemisphere, checked for clashes
+    den = re.search(r"den-([^_]+)", surfs["inner"]).group(1)
+    outs = {}
+    for hemi in HEMIS:
+        covering = [
+            fpath
+            for fpath in vol_fpaths
+            if (m := re.search(r"hemi-([LR])", fpath.name)) is None or m[1] == hemi
+        ]
+        outs[hemi] = out_fpaths(covering, annot_dir, out_dir, den, hemi)
+
+    for (shape, _), vols in grids.items():
+        # Decompress every volume of the grid once, for both hemispheres
+        data = {fpath: np.asanyarray(img.dataobj).reshape(-1) for fpath, img in vols}
+        for hemi in HEMIS:
+            inner = input_dir / space / surfs["inner"].format(hemi=hemi)
+            outer = input_dir / space / surfs["outer"].format(hemi=hemi)
+            out = outs[hemi]
+            targets = [fpath for fpath, _ in vols if fpath in out]
+            if not targets:
+                continue
+
+            op = RibbonOperator.cached(
+                inner_fpath=inner, outer_fpath=outer, img=vols[0][1]
+            )
+
+            # Continuous maps: one multiplication for the whole grid
+            scalars = [fpath for fpath in targets if not is_label(fpath)]
+            if scalars:
+                projected = op.project(op.sample([data[fpath] for fpath in scalars]))
+                for fpath, values in zip(scalars, projected.T):
+                    print(f"[PROJECTING] {fpath.name} (hemi={hemi}, grid={shape})")
+                    out[fpath].parent.mkdir(parents=True, exist_ok=True)
+                    save_metric(values, out[fpath], hemi=hemi)
+
+            for fpath in targets:
+                if not is_label(fpath):
+                    continue
+                print(f"[PROJECTING] {fpath.name} (hemi={hemi}, grid={shape})")
+                lut_fpath = fpath.with_name(fpath.name.split(".")[0] + ".txt")
+                out[fpath].parent.mkdir(parents=True, exist_ok=True)
+                save_label(
+                    op.project_labels(op.sample([data[fpath]])[:, 0]),
+                    out[fpath],
+                    hemi=hemi,
+                    names=read_lut(lut_fpath) if lut_fpath.exists() else None,
+                )
+
+
+def main() -> None:
+    input_dir = Path("share/Inputs")
+    output_dir = Path("share/Outputs")
+    resources_dir = Path("resources")
+
+    for space, surfs in SPACES_MAP.items():
+        project_space(
+            input_dir=input_dir,
+            annot_dir=resources_dir / space / "annotations",
+            out_dir=output_dir / space / "annotations",
+            space=space,
+            surfs=surfs,
+        )
+
+
+if __name__ == "__main__":
+    main()
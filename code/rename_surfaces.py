@@ -7,12 +7,26 @@
 # ]
 # ///
 
-"""Script to rename input and output files of neuromaps-nhp-prep."""
+"""Script to rename input and output files of neuromaps-nhp-prep.
 
+Renames are recorded in a journal in the root directory. Files renamed, found
+already canonical or not matching any pattern before are recognised from their
+inode, size and mtime, which a rename preserves, so reruns only look at new or
+changed files. The renames of
+the last run can be undone with `--undo`.
+"""
+
+import argparse
+import json
 import re
+from collections.abc import Callable
+from datetime import datetime
 from pathlib import Path
 
-import nibabel as nib
+if __package__:
+    from .surface_area.utils import load_giftis
+else:
+    from surface_area.utils import load_giftis
 
 HEMI_MAP = {
     "L": "L",
@@ -24,10 +38,14 @@ HEMI_MAP = {
     "rh": "R",
     "right": "R",
 }
+JOURNAL_FNAME = ".rename_journal.json"
+CANONICAL_REGEX = r"src-[a-zA-Z0-9]+(?:_to-[a-zA-Z0-9]+)?_den-\d+k_hemi-[LR]_"
 
 
 def find_surf_density(fpath: Path) -> str:
     """Find and return number of vertices in a surface file."""
+    import nibabel as nib
+
     gii = nib.load(fpath)
     pointset_array = gii.get_arrays_from_intent("NIFTI_INTENT_POINTSET")[0]
     vertices = pointset_array.data.shape[0]
@@ -35,6 +53,17 @@ def find_surf_density(fpath: Path) -> str:
     return f"{vertices_k}k"
 
 
+def find_surfs_density(fpaths: list[Path]) -> dict[Path, str]:
+    """Find number of vertices of many surface files, decoded in parallel."""
+    densities = {}
+    for fpath, arrays, meta in load_giftis(fpaths):
+        if arrays is None:
+            raise meta["error"]
+        vertices = arrays[meta["intents"].index("pointset")].shape[0]
+        densities[fpath] = f"{round(vertices / 1000)}k"
+    return densities
+
+
 def find_prefix(fpath: Path) -> tuple[str, ...]:
     """Get template and target entities."""
     parent_dir = fpath.parts[-2].split("-")
@@ -51,35 +80,117 @@ def find_entities(fpath: Path, template: str, regex: dict[str, str]) -> dict[str
         print(f"WARNING: Did not find matching entities for: {fpath.name}")
         return {}
     entity_map = entity_map.groupdict()
+    if entity_map["hemi"] not in HEMI_MAP:
+        print(f"WARNING: Unknown hemisphere {entity_map['hemi']!r} in: {fpath.name}")
+        return {}
     if entity_map.get("suffix") is not None and entity_map["suffix"] == "mid":
         entity_map["suffix"] = "midthickness"
     return entity_map
 
 
-def rename_surf(fpath: Path, regex: dict[str, str]) -> None:
-    """Rename surface file."""
+def canonical_fname(
+    fpath: Path, regex: dict[str, str], density: str | None = None
+) -> str | None:
+    """Canonical name of a surface file, or None if its entities are not found."""
     # Find template (and target)
     target, template = find_prefix(fpath=fpath)
 
     # Find density
-    density = find_surf_density(fpath)
+    density = density or find_surf_density(fpath)
 
     # Find other entities
     entity_map = find_entities(fpath=fpath, template=template, regex=regex)
     if entity_map:
-        out_fname = (
+        desc = entity_map.get("desc")
+        return (
             f"src-{template}"
             f"{f'_to-{target}' if target is not None else ''}"
             f"_den-{density}"
             f"_hemi-{HEMI_MAP[entity_map['hemi']]}"
-            f"{f'_desc-{entity_map["desc"]}' if entity_map.get('desc') is not None else ''}"
+            f"{f'_desc-{desc}' if desc is not None else ''}"
             f"_{entity_map['suffix']}"
             f".{entity_map['ext']}"
         )
-        fpath.replace(fpath.parent / str(fpath.name).replace(fpath.name, out_fname))
+    return None
+
+
+def rename_surf(
+    fpath: Path, regex: dict[str, str], density: str | None = None
+) -> Path | None:
+    """Rename surface file, returning its new path."""
+    out_fname = canonical_fname(fpath=fpath, regex=regex, density=density)
+    if out_fname is None:
+        return None
+    return fpath.replace(fpath.parent / out_fname)
+
+
+def stat_key(fpath: Path) -> str:
+    """Identity of a file that survives renames but not changes."""
+    stat = fpath.stat()
+    return f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_journal(root: Path) -> dict:
+    """Journal of the files canonicalized (or unmatched) so far and of each run."""
+    journal = {"files": {}, "unmatched": {}, "runs": []}
+    journal_fpath = root / JOURNAL_FNAME
+    if journal_fpath.exists():
+        journal.update(json.loads(journal_fpath.read_text()))
+    return journal
+
+
+def save_journal(root: Path, journal: dict) -> None:
+    """Write the journal back to the root directory."""
+    (root / JOURNAL_FNAME).write_text(json.dumps(journal, indent=2))
+
+
+def pending_files(fpaths: list[Path], root: Path, journal: dict) -> list[Path]:
+    """Files that are neither journaled nor already canonically named."""
+    pending = []
+    for fpath in fpaths:
+        key = stat_key(fpath)
+        if key in journal["files"] or key in journal["unmatched"]:
+            continue
+        if re.match(CANONICAL_REGEX, fpath.name):
+            journal["files"][key] = str(fpath.relative_to(root))
+            continue
+        pending.append(fpath)
+    return pending
+
+
+def rename_files(
+    fpaths: list[Path],
+    regex_for: Callable[[Path], dict[str, str] | str],
+    root: Path,
+    journal: dict,
+    dry_run: bool = False,
+) -> list[tuple[str, str]]:
+    """Rename new or changed files and journal them (paths relative to `root`).
+
+    Files whose entities are not found are journaled as unmatched, so they are
+    not decoded (and warned about) again until they change.
+    """
+    fpaths = pending_files(fpaths, root=root, journal=journal)
+    densities = find_surfs_density(fpaths)
+    renames = []
+    for fpath in fpaths:
+        out_fname = canonical_fname(
+            fpath=fpath, regex=regex_for(fpath), density=densities[fpath]
+        )
+        if out_fname is None:
+            journal["unmatched"][stat_key(fpath)] = str(fpath.relative_to(root))
+            continue
+        new_fpath = fpath.parent / out_fname
+        if not dry_run:
+            fpath.replace(new_fpath)
+            journal["files"][stat_key(new_fpath)] = str(new_fpath.relative_to(root))
+        renames.append((str(fpath.relative_to(root)), str(new_fpath.relative_to(root))))
+    return renames
 
 
-def rename_inputs(input_dir: Path) -> None:
+def rename_inputs(
+    input_dir: Path, root: Path, journal: dict, dry_run: bool = False
+) -> list[tuple[str, str]]:
     """Helper to rename inputs."""
     print("Renaming input files...")
     input_regex = {
@@ -90,29 +201,104 @@ def rename_inputs(input_dir: Path) -> None:
         "S1200": r"\w+.(?P<hemi>\w+).(?P<suffix>\w+).\w+.(?P<ext>\w+\.gii)",
         "Yerkes19": r"\w+.(?P<hemi>\w+).(?P<suffix>\w+(?:_\w+)*).\w+.(?P<ext>\w+\.gii)",
     }
-    for fpath in input_dir.rglob("**/*.gii"):
-        if not fpath.name.endswith((".surf.gii", "rsl.gii")):
-            continue
-        rename_surf(fpath=fpath, regex=input_regex)
+    fpaths = [
+        fpath
+        for fpath in input_dir.rglob("**/*.gii")
+        if fpath.name.endswith((".surf.gii", "rsl.gii"))
+    ]
+    return rename_files(
+        fpaths, lambda _: input_regex, root=root, journal=journal, dry_run=dry_run
+    )
 
 
-def rename_outputs(input_dir: Path):
+def rename_outputs(
+    input_dir: Path, root: Path, journal: dict, dry_run: bool = False
+) -> list[tuple[str, str]]:
     """Helper to rename outputs"""
     print("Renaming output files...")
-    for fpath in input_dir.rglob("**/*.gii"):
-        output_regex = r"(?P<hemi>\w+).\w+_(?P<suffix>\w+)_\w+_\w+.(?P<ext>\w+\.gii)"
-        if not fpath.name.endswith((".surf.gii")):
-            continue
+    fpaths = [
+        fpath
+        for fpath in input_dir.rglob("**/*.gii")
+        if fpath.name.endswith(".surf.gii")
+    ]
+
+    def output_regex(fpath: Path) -> str:
         if "S1200" in str(fpath):
-            output_regex = (
+            return (
                 r"(?P<hemi>\w+)\.[\w-]+\.(?P<suffix>\w+)\.(?:\w+\.){2}(?P<ext>\w+\.gii)"
             )
-        rename_surf(fpath=fpath, regex=output_regex)
+        return r"(?P<hemi>\w+).\w+_(?P<suffix>\w+)_\w+_\w+.(?P<ext>\w+\.gii)"
+
+    return rename_files(
+        fpaths, output_regex, root=root, journal=journal, dry_run=dry_run
+    )
+
+
+def undo_last_run(root: Path, journal: dict) -> None:
+    """Revert the renames of the last journaled run."""
+    if not journal["runs"]:
+        print("Nothing to undo")
+        return
+    run = journal["runs"].pop()
+    print(f"Undoing {len(run['renames'])} rename(s) from {run['date']}...")
+    for old_fname, new_fname in reversed(run["renames"]):
+        old_fpath, new_fpath = root / old_fname, root / new_fname
+        if not new_fpath.exists() or old_fpath.exists():
+            print(f"WARNING: Cannot restore {old_fpath} from {new_fpath}")
+            continue
+        journal["files"].pop(stat_key(new_fpath), None)
+        new_fpath.replace(old_fpath)
 
 
 def main() -> None:
-    rename_inputs(Path("share/Inputs"))
-    rename_outputs(Path("share/Outputs"))
+    parser = argparse.ArgumentParser(
+        description="Rename input and output surfaces to the canonical scheme"
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        nargs="?",
+        default=Path("share"),
+        help="Directory with the `Inputs` and `Outputs` to rename "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--undo", action="store_true", help="Revert the renames of the last run"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which files would be renamed without renaming them",
+    )
+    args = parser.parse_args()
+
+    journal = load_journal(args.root)
+    if args.dry_run:
+        renames = rename_inputs(
+            args.root / "Inputs", root=args.root, journal=journal, dry_run=True
+        )
+        renames += rename_outputs(
+            args.root / "Outputs", root=args.root, journal=journal, dry_run=True
+        )
+        for old_fname, new_fname in renames:
+            print(f"  {old_fname} -> {new_fname}")
+        return
+    if args.undo:
+        undo_last_run(args.root, journal)
+    else:
+        renames = rename_inputs(args.root / "Inputs", root=args.root, journal=journal)
+        renames += rename_outputs(
+            args.root / "Outputs", root=args.root, journal=journal
+        )
+        print(f"Renamed {len(renames)} file(s)")
+        if renames:
+            journal["runs"].append(
+                {
+                    "date": datetime.now().isoformat(timespec="seconds"),
+                    "renames": renames,
+                }
+            )
+    save_journal(args.root, journal)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 #!/bin/bash
 
-ROOT_FOLDER="/Users/tamsin.rogers/Desktop/github/neuromaps-nhp-prep/share/Inputs"
+ROOT_FOLDER="${1:-share/Inputs}"
 OUTPUT_CSV="input_hemispheres.csv"
 
 # Write CSV header
@@ -1,8 +1,19 @@
+import argparse
 import csv
 import os
 from pathlib import Path
 
-ROOT_FOLDER = Path("/Users/tamsin.rogers/Desktop/github/neuromaps-nhp-prep/share/Inputs")
+parser = argparse.ArgumentParser(
+    description="Fix the hemisphere of input files, from a CSV"
+)
+parser.add_argument(
+    "root",
+    type=Path,
+    nargs="?",
+    default=Path("share/Inputs"),
+    help="Directory with one sub-directory per template (default: %(default)s)",
+)
+ROOT_FOLDER = parser.parse_args().root
 CSV_FILE = Path("input_hemispheres.csv")
 
 with open(CSV_FILE, newline="") as csvfile:
@@ -1,8 +1,17 @@
+import argparse
 import os
 import re
 from pathlib import Path
 
-ROOT_FOLDER = "/Users/tamsin.rogers/Desktop/github/neuromaps-nhp-prep/share/Inputs"
+parser = argparse.ArgumentParser(description="Prefix surface files with their template")
+parser.add_argument(
+    "root",
+    type=Path,
+    nargs="?",
+    default=Path("share/Inputs"),
+    help="Directory with one sub-directory per template (default: %(default)s)",
+)
+ROOT_FOLDER = parser.parse_args().root
 
 for filepath in Path(ROOT_FOLDER).rglob("*surf*"):
     if not filepath.is_file():
@@ -1,28 +1,44 @@
+import argparse
 import csv
-import os
 from pathlib import Path
 
-ROOT_FOLDER = Path("/Users/tamsin.rogers/Desktop/github/neuromaps-nhp-prep/share/Inputs")
-CSV_FILE = Path("input_vertices.csv")
+import nibabel as nib
 
-with open(CSV_FILE, newline="") as csvfile:
-    reader = csv.reader(csvfile)
-    next(reader)  # skip header
+parser = argparse.ArgumentParser(
+    description="Write the vertex count (density) of each input surface to a CSV"
+)
+parser.add_argument(
+    "root",
+    type=Path,
+    nargs="?",
+    default=Path("share/Inputs"),
+    help="Directory with one sub-directory per template (default: %(default)s)",
+)
+parser.add_argument(
+    "-o",
+    "--output",
+    type=Path,
+    default=Path("input_vertices.csv"),
+    help="CSV to write, as read by rename_densities.py (default: %(default)s)",
+)
+args = parser.parse_args()
+ROOT_FOLDER = args.root
+CSV_FILE = args.output
 
-    for row in reader:
-        if len(row) < 3:
-            continue
-
-        subdir, filename, vertex_count = [col.strip() for col in row]
+with open(CSV_FILE, "w", newline="") as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["Subdirectory", "Filename", "VertexCount"])
 
-        dir_path = ROOT_FOLDER / subdir
-        file_path = dir_path / filename
+    for file_path in sorted(ROOT_FOLDER.glob("*/*.gii")):
+        if not file_path.name.endswith((".surf.gii", "rsl.gii")):
+            continue
 
-        if file_path.is_file():
-            new_filename = f"den-{vertex_count}_{filename}"
-            new_path = dir_path / new_filename
+        arrays = nib.load(file_path).get_arrays_from_intent("NIFTI_INTENT_POINTSET")
+        if not arrays:
+            print(f"No vertices in: {file_path}")
+            continue
 
-            os.rename(file_path, new_path)
-            print(f"Renamed: {file_path} -> {new_path}")
-        else:
-            print(f"File not found: {file_path}")
+        # Rounded to the nearest thousand, as in the canonical `den-` entity
+        vertex_count = f"{round(arrays[0].data.shape[0] / 1000)}k"
+        writer.writerow([file_path.parent.name, file_path.name, vertex_count])
+        print(f"{file_path}: {vertex_count}")
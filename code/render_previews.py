@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "matplotlib==3.10.3",
+#     "nibabel==5.3.2",
+# ]
+# ///
+
+"""Script to render the `.surf.png` preview of every surface annotation.
+
+Replaces the notebooks' per-map `plot_surf` calls: each midthickness is read
+once from the mesh cache (with its face normals) and, for each camera, its
+front-facing triangles are projected and sorted back to front (painter's
+algorithm) a single time. Annotations then only need their per-triangle colours
+before being rasterized, on a pool of headless workers (plain `Figure`s, no GUI
+backend) that receive the cached projections when they start.
+"""
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from mesh_cache import mesh_topology
+from surface_utils import find_surface, mesh_orientation, parse_entities
+
+# Camera azimuth (deg, from +x towards +y) of the lateral and medial views
+CAMERAS = {
+    "L": {"lateral": 180.0, "medial": 0.0},
+    "R": {"lateral": 0.0, "medial": 180.0},
+}
+SUFFIXES = (".func.gii", ".shape.gii", ".label.gii")
+FIGSIZE = (16, 5)
+DPI = 100
+CMAP = "RdBu_r"
+
+# Projections of every mesh, set once in each worker
+_VIEWS = {}
+
+
+def project_mesh(
+    mesh: dict[str, np.ndarray], hemi: str
+) -> dict[str, dict[str, np.ndarray]]:
+    """Visible triangles of a cached mesh for each camera, sorted back to front."""
+    coords = np.asarray(mesh["coords"], dtype=np.float64)
+    faces = np.asarray(mesh["faces"], dtype=np.int64)
+    # Outward normals, whichever way the triangles are wound
+    normals = mesh_orientation(coords, faces) * np.asarray(mesh["face_normals"])
+    centroids = coords[faces].mean(axis=1)
+
+    views = {}
+    for view, azimuth in CAMERAS[hemi].items():
+        angle = np.deg2rad(azimuth)
+        towards = np.array([np.cos(angle), np.sin(angle), 0.0])
+        right = np.cross(-towards, [0.0, 0.0, 1.0])
+        up = np.cross(right, -towards)
+        facing = normals @ towards
+        visible = np.flatnonzero(facing > 0)
+        order = visible[np.argsort(centroids[visible] @ towards)]
+        screen = coords @ np.column_stack([right, up])
+        views[view] = {
+            "corners": faces[order],
+            "polygons": screen[faces[order]].astype(np.float32),
+            # Lambertian shading with some ambient light
+            "shade": (0.35 + 0.65 * facing[order]).astype(np.float32),
+            "limits": np.array([screen.min(axis=0), screen.max(axis=0)]),
+        }
+    return views
+
+
+def init_worker(views: dict) -> None:
+    """Receive the projections of every mesh once per worker process."""
+    _VIEWS.update(views)
+
+
+def face_colors(
+    gii: nib.GiftiImage, corners: np.ndarray, scale: dict | None
+) -> np.ndarray:
+    """RGBA colour of each triangle, from its label or mean value."""
+    data = np.asarray(gii.darrays[0].data)
+    if scale is None:
+        # Dense lookup table, black for the background and unknown keys. Keys
+        # are offset by the smallest one, so negative keys do not wrap around
+        values = data[corners[:, 0]].astype(np.int64)
+        labels = [label for label in gii.labeltable.labels if label.key != 0]
+        keys = [0, *(label.key for label in labels)]
+        min_key = min([values.min(initial=0), *keys])
+        max_key = max([values.max(initial=0), *keys])
+        lut = np.zeros((max_key - min_key + 1, 4))
+        for label in labels:
+            lut[label.key - min_key] = label.rgba
+        colors = lut[values - min_key]
+        colors[:, 3] = 1.0
+        return colors
+
+    values = data.astype(np.float64)[corners].mean(axis=1)
+    colors = colormaps[CMAP](Normalize(**scale)(values))
+    colors[~np.isfinite(values)] = (0.0, 0.0, 0.0, 1.0)
+    return colors
+
+
+def color_scale(gii: nib.GiftiImage) -> dict[str, float]:
+    """Colour range of a continuous map, robust to outliers."""
+    data = np.asarray(gii.darrays[0].data, dtype=np.float64)
+    finite = data[np.isfinite(data)]
+    if not finite.size:
+        return {"vmin": 0.0, "vmax": 1.0}
+    return {"vmin": np.percentile(finite, 2), "vmax": np.percentile(finite, 98)}
+
+
+def render_annotation(
+    annot_fpath: Path, mesh_key: tuple[str, str], out_fpath: Path
+) -> Path:
+    """Rasterize an annotation through the cached views of its mesh."""
+    gii = nib.load(annot_fpath)
+    scale = None if annot_fpath.name.endswith(".label.gii") else color_scale(gii)
+    fig = Figure(figsize=FIGSIZE, dpi=DPI)
+    for idx, view in enumerate(_VIEWS[mesh_key].values()):
+        colors = face_colors(gii, view["corners"], scale)
+        colors[:, :3] *= view["shade"][:, None]
+        ax = fig.add_axes([0.02 + 0.34 * idx, 0.05, 0.34, 0.9])
+        ax.add_collection(
+            PolyCollection(
+                view["polygons"],
+                facecolors=colors,
+                edgecolors=colors,
+                linewidths=0.1,
+                antialiaseds=False,
+            )
+        )
+        ax.set_xlim(view["limits"][:, 0])
+        ax.set_ylim(view["limits"][:, 1])
+        ax.set_aspect("equal")
+        ax.axis("off")
+
+    title = annot_fpath.name.split(".")[0].removesuffix("_annot")
+    fig.text(0.72, 0.8, title, fontsize=18, ha="left")
+    if scale is not None:
+        cax = fig.add_axes([0.72, 0.3, 0.015, 0.4])
+        ticks = np.linspace(scale["vmin"], scale["vmax"], 3)
+        cbar = fig.colorbar(
+            ScalarMappable(norm=Normalize(**scale), cmap=CMAP), cax=cax, ticks=ticks
+        )
+        cbar.ax.set_yticklabels([f"{tick:.2f}" for tick in ticks], fontsize=16)
+    fig.savefig(out_fpath, dpi=DPI)
+    return out_fpath
+
+
+def find_annotations(
+    resources_dir: Path, input_dir: Path
+) -> dict[Path, list[tuple[Path, Path]]]:
+    """(annotation, preview) pairs of every annotation, grouped by midthickness."""
+    tasks = defaultdict(list)
+    for annot_fpath in sorted(resources_dir.glob("*/annotations/**/*.gii")):
+        if not annot_fpath.name.endswith(SUFFIXES):
+            continue
+        entities = parse_entities(annot_fpath.name)
+        if not {"src", "den", "hemi"} <= entities.keys():
+            continue
+        space, den, hemi = entities["src"], entities["den"], entities["hemi"]
+        mid_fpath = find_surface(
+            input_dir, space, den, hemi, "midthickness", generated=True
+        )
+        if mid_fpath is None:
+            print(f"WARNING: No midthickness for {annot_fpath.name}")
+            continue
+        out_fpath = annot_fpath.with_name(annot_fpath.name.split(".")[0] + ".surf.png")
+        tasks[mid_fpath].append((annot_fpath, out_fpath))
+    return tasks
+
+
+def is_stale(out_fpath: Path, *in_fpaths: Path) -> bool:
+    """Whether a preview is missing or older than what it is rendered from."""
+    return not out_fpath.exists() or out_fpath.stat().st_mtime < max(
+        fpath.stat().st_mtime for fpath in in_fpaths
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Render preview images of all surface annotations"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        type=Path,
+        default=Path("share/Inputs"),
+        help="Directory with the midthickness of each space (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--resources-dir",
+        type=Path,
+        default=Path("resources"),
+        help="Directory with the annotations of each space (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of rendering workers"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-render previews that are up to date"
+    )
+    args = parser.parse_args()
+
+    tasks = find_annotations(args.resources_dir, args.input_dir)
+    views, pending = {}, []
+    for mid_fpath, annots in tasks.items():
+        annots = [
+            (annot_fpath, out_fpath)
+            for annot_fpath, out_fpath in annots
+            if args.force or is_stale(out_fpath, annot_fpath, mid_fpath)
+        ]
+        if not annots:
+            continue
+        hemi = parse_entities(mid_fpath.name)["hemi"]
+        key = (mid_fpath.name, hemi)
+        views[key] = project_mesh(mesh_topology(mid_fpath), hemi=hemi)
+        pending += [(annot_fpath, key, out_fpath) for annot_fpath, out_fpath in annots]
+
+    print(f"Rendering {len(pending)} preview(s) from {len(views)} mesh(es)")
+    if not pending:
+        return 0
+
+    failed = 0
+    with ProcessPoolExecutor(
+        max_workers=args.jobs, initializer=init_worker, initargs=(views,)
+    ) as pool:
+        futures = {
+            pool.submit(render_annotation, annot_fpath, key, out_fpath): annot_fpath
+            for annot_fpath, key, out_fpath in pending
+        }
+        for future in as_completed(futures):
+            try:
+                print(f"✓ {future.result()}")
+            except Exception as e:
+                print(f"✗ Failed to render {futures[future]}: {e}")
+                failed += 1
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    exit(main())
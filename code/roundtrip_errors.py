@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+#     "scipy==1.15.3",
+# ]
+# ///
+
+"""Script to measure the round-trip (A -> B -> A) error of every registration.
+
+For each pair of templates registered in both directions in `share/Outputs`,
+the registered spheres give sparse barycentric operators A -> B and B -> A
+(cached, and each built once for both round trips it takes part in). Their
+product is applied at once to the source sphere and midthickness coordinates,
+giving per-vertex angular drift on the sphere and displacement (mm) of a test
+metric, the midthickness position. Error maps are written next to each
+registration and summary matrices in the output directory.
+"""
+
+import argparse
+import itertools as it
+import json
+from pathlib import Path
+
+import numpy as np
+from mesh_cache import mesh_topology
+from scipy import sparse
+from surface_utils import (
+    HEMIS,
+    barycentric_operator,
+    cached_operator,
+    content_hash,
+    find_surface,
+    parse_entities,
+    save_metric,
+)
+
+ERROR_FNAME = (
+    "src-{src}_via-{via}_den-{den}_hemi-{hemi}_desc-{desc}_roundtrip.shape.gii"
+)
+SUMMARY_FNAME = "desc-roundtrip_{stat}.tsv"
+ERRORS = {"angle": "deg", "displacement": "mm"}
+
+
+def find_registrations(
+    input_dir: Path, output_dir: Path, hemi: str
+) -> dict[tuple[str, str], dict[str, Path]]:
+    """Densest registered sphere of each (src, tgt) pair, with the source surfaces."""
+    registrations = {}
+    reg_fpaths = sorted(
+        output_dir.glob(f"*/src-*_to-*_hemi-{hemi}_sphere.*.gii"),
+        key=lambda fpath: int(parse_entities(fpath.name)["den"].rstrip("k")),
+    )
+    for reg_fpath in reg_fpaths:
+        entities = parse_entities(reg_fpath.name)
+        src, tgt, den = entities["src"], entities["to"], entities["den"]
+        src_sphere = find_surface(input_dir, src, den, hemi, "sphere")
+        src_mid = find_surface(input_dir, src, den, hemi, "midthickness")
+        if src_sphere is None or src_mid is None:
+            print(f"WARNING: No {src} sphere or midthickness for {reg_fpath.name}")
+            continue
+        registrations[(src, tgt)] = {
+            "registered": reg_fpath,
+            "sphere": src_sphere,
+            "mid": src_mid,
+            "den": den,
+        }
+    return registrations
+
+
+def registration_operator(reg_fpath: Path, tgt_fpath: Path) -> sparse.csr_matrix:
+    """Cached (target, source) operator carrying source data through a registration."""
+
+    def build():
+        registered = mesh_topology(reg_fpath)
+        tgt_sphere = np.asarray(mesh_topology(tgt_fpath)["coords"], dtype=np.float64)
+        # Both spheres about the target centre, as in `align_surfaces.align_pair`
+        centre = tgt_sphere.mean(axis=0)
+        return barycentric_operator(
+            np.asarray(registered["coords"], dtype=np.float64) - centre,
+            np.asarray(registered["faces"], dtype=np.int64),
+            tgt_sphere - centre,
+        )
+
+    key = content_hash(reg_fpath, tgt_fpath)
+    return cached_operator("register", key, build)
+
+
+def roundtrip_errors(
+    forward: sparse.csr_matrix, backward: sparse.csr_matrix, files: dict[str, Path]
+) -> dict[str, np.ndarray]:
+    """Angular (deg) and midthickness (mm) error of each vertex after A -> B -> A."""
+    sphere = np.asarray(mesh_topology(files["sphere"])["coords"], dtype=np.float64)
+    mid = mesh_topology(files["mid"])["coords"]
+    sphere -= sphere.mean(axis=0)
+    unit = sphere / np.linalg.norm(sphere, axis=1, keepdims=True)
+
+    # One product for every quantity pushed through the round trip
+    data = np.column_stack([unit, mid]).astype(np.float64)
+    moved = backward @ (forward @ data)
+    moved_unit = moved[:, :3] / np.linalg.norm(moved[:, :3], axis=1, keepdims=True)
+    cosine = np.clip(np.einsum("ij,ij->i", unit, moved_unit), -1.0, 1.0)
+    return {
+        "angle": np.rad2deg(np.arccos(cosine)),
+        "displacement": np.linalg.norm(moved[:, 3:] - mid, axis=1),
+    }
+
+
+def summarize(errors: np.ndarray) -> dict[str, float]:
+    """Summary statistics of an error map."""
+    return {
+        "mean": float(errors.mean()),
+        "p95": float(np.percentile(errors, 95)),
+        "max": float(errors.max()),
+    }
+
+
+def write_matrices(summary: dict, output_dir: Path) -> None:
+    """Write a (source x via) matrix per error and statistic, averaging hemispheres."""
+    templates = sorted({tpl for src, via in summary for tpl in (src, via)})
+    for error, stat in it.product(ERRORS, ("mean", "p95", "max")):
+        lines = ["src\\via\t" + "\t".join(templates)]
+        for src in templates:
+            row = []
+            for via in templates:
+                values = [
+                    hemis[hemi][error][stat]
+                    for hemi in HEMIS
+                    if (hemis := summary.get((src, via))) and hemi in hemis
+                ]
+                row.append(f"{np.mean(values):.4f}" if values else "n/a")
+            lines.append("\t".join([src, *row]))
+        fpath = output_dir / SUMMARY_FNAME.format(stat=f"{error}-{stat}")
+        fpath.write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the round-trip error of every pair of registrations"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        type=Path,
+        default=Path("share/Inputs"),
+        help="Directory with one sub-directory per template (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=Path("share/Outputs"),
+        help="Directory with the `<tgt>-<src>` registrations (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    summary = {}
+    for hemi in HEMIS:
+        registrations = find_registrations(args.input_dir, args.output_dir, hemi)
+        pairs = []
+        for src, via in sorted(registrations):
+            if (via, src) in registrations:
+                pairs.append((src, via))
+            else:
+                print(f"WARNING: No {via} -> {src} registration (hemi={hemi})")
+        # Each directed operator serves two round trips but is built once
+        operators = {
+            (src, via): registration_operator(
+                registrations[(src, via)]["registered"],
+                registrations[(via, src)]["sphere"],
+            )
+            for src, via in pairs
+        }
+
+        for src, via in pairs:
+            files = registrations[(src, via)]
+            print(f"[PROCESSING] {src} -> {via} -> {src} (hemi={hemi})")
+            errors = roundtrip_errors(
+                operators[(src, via)], operators[(via, src)], files
+            )
+            for desc, values in errors.items():
+                save_metric(
+                    values,
+                    files["registered"].with_name(
+                        ERROR_FNAME.format(
+                            src=src, via=via, den=files["den"], hemi=hemi, desc=desc
+                        )
+                    ),
+                    hemi=hemi,
+                )
+            stats = {desc: summarize(values) for desc, values in errors.items()}
+            summary.setdefault((src, via), {})[hemi] = stats
+            print(
+                "  "
+                + ", ".join(
+                    f"{desc}: mean={stat['mean']:.3f} {ERRORS[desc]}, "
+                    f"p95={stat['p95']:.3f} {ERRORS[desc]}"
+                    for desc, stat in stats.items()
+                )
+            )
+
+    if not summary:
+        print("✗ No pair registered in both directions")
+        return
+    write_matrices(summary, args.output_dir)
+    (args.output_dir / "desc-roundtrip_summary.json").write_text(
+        json.dumps(
+            {f"{src}-{via}": hemis for (src, via), hemis in summary.items()}, indent=2
+        )
+    )
+    print(f"Summary written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,7 @@ import argparse
 from pathlib import Path
 from typing import Iterable
 
-from niwrap import workbench as wb
-from styxdocker import DockerRunner
-from utils import find_surface_files, get_map_info
+from utils import find_surface_files, get_maps_info
 from validate_surface_files import validate_output_file_data
 
 
@@ -13,6 +11,8 @@ def compute_surface_area(input_gifti: Path, output_metric: Path) -> None:
     Compute the surface area of a brain surface mesh using niwrap.
 
     """
+    from niwrap import workbench as wb
+
     # test if file exists
     if not input_gifti.exists():
         print(f"✗ Input file does not exist: {input_gifti}")
@@ -31,8 +31,11 @@ def process_files(
     successful = 0
     failed = 0
 
+    # Decode all inputs up front, in parallel
+    maps_info = get_maps_info(input_files)
+
     for input_gifti in input_files:
-        map_info = get_map_info(input_gifti)
+        map_info = maps_info[input_gifti]
 
         new_name = f"src-{map_info['Space']}_den-{map_info['Density']}_hemi-{map_info['Hemi']}_desc-vaavg_midthickness.shape.gii"
 
@@ -119,8 +122,12 @@ Examples:
     # Convert input directory to absolute path for consistency
     input_dir = args.input_dir.absolute()
 
-    my_runner = DockerRunner()
-    my_runner.data_dir = input_dir
+    if not args.dry_run:
+        # Only needed (and imported) when files are actually processed
+        from styxdocker import DockerRunner
+
+        my_runner = DockerRunner()
+        my_runner.data_dir = input_dir
 
     if args.verbose:
         print(f"Input directory: {input_dir}")
@@ -1,6 +1,15 @@
+import math
+import threading
+import xml.parsers.expat
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Iterable
+
 import nibabel as nib
+import numpy as np
+
+MAX_BYTES_IN_FLIGHT = 512 * 1024**2
 
 
 def find_surface_files(
@@ -55,23 +64,181 @@ def detect_space(path: Path) -> str:
     raise Exception(f"Could not detect 'space' from filename/path: {path}")
 
 
-def get_map_info(input_gifti, density=True, hemi=True, space=True):
+def load_gifti(input_gifti: Path) -> tuple[list[np.ndarray], dict]:
     """
-    Extract relevant information from the output metric.
+    Decode all data arrays of a GIFTI file, with its metadata and array intents.
+    """
+    gii = nib.load(str(input_gifti))
+    if not isinstance(gii, nib.GiftiImage):
+        raise TypeError(f"Not a GIFTI file: {input_gifti}")
+    arrays = [np.asarray(darray.data) for darray in gii.darrays]
+    meta = dict(gii.meta)
+    meta["intents"] = [
+        nib.nifti1.intent_codes.label[darray.intent] for darray in gii.darrays
+    ]
+    return arrays, meta
+
+
+def decoded_size(input_gifti: Path) -> int:
+    """
+    Size in bytes of the decoded data arrays of a GIFTI file, from its XML header.
+
+    Only the start tags are parsed, streaming the file until all data arrays
+    are seen, since compressed arrays decode to many times their size on disk.
+    Falls back to the file size if the header cannot be parsed.
+    """
+    sizes = []
+    n_arrays = None
+
+    def _start(name, attrs):
+        nonlocal n_arrays
+        if name == "GIFTI":
+            n_arrays = int(attrs.get("NumberOfDataArrays", -1))
+        elif name == "DataArray":
+            dims = [int(attrs[f"Dim{i}"]) for i in range(int(attrs["Dimensionality"]))]
+            itemsize = nib.nifti1.data_type_codes.dtype[attrs["DataType"]].itemsize
+            sizes.append(math.prod(dims) * itemsize)
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = _start
+    try:
+        with open(input_gifti, "rb") as fh:
+            while n_arrays is None or len(sizes) < n_arrays:
+                chunk = fh.read(1 << 20)
+                if not chunk:
+                    break
+                parser.Parse(chunk, False)
+    except (OSError, KeyError, ValueError, xml.parsers.expat.ExpatError):
+        return Path(input_gifti).stat().st_size if Path(input_gifti).exists() else 0
+    return sum(sizes)
+
+
+def load_giftis(
+    input_giftis: Iterable[Path],
+    max_workers: int | None = None,
+    max_bytes: int = MAX_BYTES_IN_FLIGHT,
+    ordered: bool = False,
+) -> Iterator[tuple[Path, list[np.ndarray] | None, dict]]:
+    """
+    Decode GIFTI files on a thread pool, yielding `(path, arrays, meta)`.
+
+    Files are yielded as they complete (or in input order if `ordered`). Each
+    worker reads the decoded size of its file from the header, then only
+    decodes it while the size of the files not yet taken by the caller (from
+    their headers, then their actual arrays) stays under `max_bytes`, or if
+    it is alone (or, in input order, the next file the caller waits for), so
+    at least one is always decoding. Files that fail to load are yielded with `arrays=None` and the
+    exception in `meta["error"]`.
+    """
+    budget = threading.Condition()
+    sizes = {}
+    taken = set()
+    first_untaken = 0
+    closed = False
+
+    def _load(index, input_gifti):
+        size = decoded_size(input_gifti)
+        with budget:
+            budget.wait_for(
+                lambda: (
+                    closed
+                    or not sizes
+                    or (ordered and index == first_untaken)
+                    or sum(sizes.values()) + size <= max_bytes
+                )
+            )
+            if closed:
+                return None
+            sizes[index] = size
+        try:
+            arrays, meta = load_gifti(input_gifti)
+        except Exception as e:
+            return input_gifti, None, {"error": e}
+        with budget:
+            sizes[index] = sum(array.nbytes for array in arrays)
+            budget.notify_all()
+        return input_gifti, arrays, meta
+
+    def _release(index):
+        nonlocal first_untaken
+        with budget:
+            sizes.pop(index, None)
+            taken.add(index)
+            while first_untaken in taken:
+                taken.remove(first_untaken)
+                first_untaken += 1
+            budget.notify_all()
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(_load, index, input_gifti): index
+            for index, input_gifti in enumerate(input_giftis)
+        }
+        in_order = deque(futures)
+        while futures:
+            if ordered:
+                done = [in_order.popleft()]
+            else:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures.pop(future)
+                yield future.result()
+                # Released once the caller has taken the result
+                _release(index)
+    finally:
+        # Unblock the workers waiting for budget if the caller stops early
+        with budget:
+            closed = True
+            budget.notify_all()
+        pool.shutdown(cancel_futures=True)
+
+
+def map_info_from_arrays(
+    input_gifti: Path,
+    arrays: list[np.ndarray],
+    meta: dict,
+    density=True,
+    hemi=True,
+    space=True,
+):
+    """
+    Extract relevant information from decoded output metric arrays.
     """
-    surface = nib.load(str(input_gifti))
     map_info = {}
 
-    map_info["NumVertices"] = surface.darrays[0].data.shape[0]
+    map_info["NumVertices"] = arrays[0].shape[0]
     if density:
-        map_info["Density"] = detect_density(surface.darrays[0].data.shape[0])
+        map_info["Density"] = detect_density(arrays[0].shape[0])
 
     if hemi:
         map_info["Hemi"] = detect_hemi(
-            surface.meta.get("AnatomicalStructurePrimary", ""), input_gifti.name
+            meta.get("AnatomicalStructurePrimary", ""), input_gifti.name
         )
 
     if space:
         map_info["Space"] = detect_space(str(input_gifti))
 
     return map_info
+
+
+def get_map_info(input_gifti, density=True, hemi=True, space=True):
+    """
+    Extract relevant information from the output metric.
+    """
+    arrays, meta = load_gifti(input_gifti)
+    return map_info_from_arrays(input_gifti, arrays, meta, density, hemi, space)
+
+
+def get_maps_info(input_giftis, density=True, hemi=True, space=True):
+    """
+    Extract relevant information from many metrics, decoded in parallel.
+    """
+    maps_info = {}
+    for input_gifti, arrays, meta in load_giftis(input_giftis):
+        if arrays is None:
+            raise meta["error"]
+        maps_info[input_gifti] = map_info_from_arrays(
+            input_gifti, arrays, meta, density, hemi, space
+        )
+    return maps_info
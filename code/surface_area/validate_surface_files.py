@@ -1,6 +1,5 @@
 from pathlib import Path
-from utils import get_map_info
-import nibabel as nib
+from utils import load_giftis
 import numpy as np
 
 
@@ -13,23 +12,22 @@ def validate_output_file_data(input_gifti:Path, output_metric: Path) -> bool:
             print("✗ Input/Output file does not exist")
             return False
 
-        try:
-            gifti_img = nib.load(str(output_metric))
-            print("✓ File loaded successfully with nibabel")
-        except Exception as e:
-            print(f"✗ Failed to load file with nibabel: {e}")
+        # Decode the output metric and the input surface concurrently
+        (_, arrays, meta), (_, input_arrays, input_meta) = load_giftis(
+            [output_metric, input_gifti], ordered=True
+        )
+        if arrays is None:
+            print(f"✗ Failed to load file with nibabel: {meta['error']}")
             return False
+        print("✓ File loaded successfully with nibabel")
 
         validation_results = {}
 
-        if isinstance(gifti_img, nib.gifti.gifti.GiftiImage):
-            validation_results["Type"] = True
-            print("✓ Type: GIFTI Metric file")
-        else:
-            validation_results["Type"] = False
-            print("✗ Type: Not a GIFTI file")
+        # Non-GIFTI files are rejected by the loader above
+        validation_results["Type"] = True
+        print("✓ Type: GIFTI Metric file")
 
-        num_maps = len(gifti_img.darrays)
+        num_maps = len(arrays)
         if num_maps == 1:
             validation_results["Number of Maps"] = True
             print(f"✓ Number of Maps: {num_maps}")
@@ -37,15 +35,15 @@ def validate_output_file_data(input_gifti:Path, output_metric: Path) -> bool:
             validation_results["Number of Maps"] = False
             print(f"✗ Number of Maps: Expected 1, got {num_maps}")
 
-        if gifti_img.darrays and len(gifti_img.darrays) > 0:
-            data_array = gifti_img.darrays[0]
-
+        if arrays and len(arrays) > 0:
             # Get actual data for numeric validation
-            data = data_array.data
+            data = arrays[0]
             if data is not None and len(data) > 0:
                 # Number of vertices
                 num_vertices_output = data.shape[0]
-                num_vertices_input = get_map_info(input_gifti)["NumVertices"]
+                if input_arrays is None:
+                    raise input_meta["error"]
+                num_vertices_input = input_arrays[0].shape[0]
                 if num_vertices_input == num_vertices_output:
                     validation_results["Number of Vertices"] = True
                 print(f"✓ Number of Vertices: {num_vertices_output}")
@@ -0,0 +1,413 @@
+"""Shared helpers to read, write and cache surface data."""
+
+import hashlib
+import re
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+BARYCENTRIC_CHUNK = 65536
+HEMIS = ("L", "R")
+STRUCTURE_MAP = {"L": "CortexLeft", "R": "CortexRight"}
+CACHE_DIR = Path("share/.cache")
+# Frequency of the geodesic subdivision (10 * f**2 + 2 vertices) per density
+ICOSPHERE_FREQUENCIES = {"10k": 32, "32k": 57, "41k": 64, "101k": 100}
+# Entity of the pyramid levels generated for densities a space has no surfaces at
+GEODESIC_DESC = "geodesic"
+
+
+def load_surface(fpath: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Return vertex coordinates and triangles of a surface file."""
+    gii = nib.load(fpath)
+    coords = gii.get_arrays_from_intent("NIFTI_INTENT_POINTSET")[0].data
+    faces = gii.get_arrays_from_intent("NIFTI_INTENT_TRIANGLE")[0].data
+    return np.asarray(coords, dtype=np.float64), np.asarray(faces, dtype=np.int64)
+
+
+def pyramid_dir(input_dir: Path, space: str) -> Path:
+    """Directory of the generated pyramid levels of a space, in `Outputs`."""
+    return input_dir.parent / "Outputs" / space / "pyramid"
+
+
+def find_surface(
+    input_dir: Path, space: str, den: str, hemi: str, kind: str, generated=False
+) -> Path | None:
+    """Native `.surf.gii` (or `.rsl.gii`) surface of a space, e.g. its `midthickness`.
+
+    With `generated`, fall back to the `desc-geodesic` pyramid level, if any.
+    """
+    prefix = f"src-{space}_den-{den}_hemi-{hemi}"
+    fpaths = [
+        input_dir / space / f"{prefix}_{kind}.{ext}" for ext in ("surf.gii", "rsl.gii")
+    ]
+    if generated:
+        fpaths.append(
+            pyramid_dir(input_dir, space)
+            / f"{prefix}_desc-{GEODESIC_DESC}_{kind}.surf.gii"
+        )
+    return next((fpath for fpath in fpaths if fpath.exists()), None)
+
+
+def parse_entities(fname: str) -> dict[str, str]:
+    """Return the `key-value` entities of a BIDS-like file name."""
+    return dict(re.findall(r"([a-zA-Z0-9]+)-([a-zA-Z0-9]+)", fname.split(".")[0]))
+
+
+def vertex_areas(coords: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Vertex areas as a third of the area of all adjacent triangles."""
+    v0, v1, v2 = (coords[faces[:, i]] for i in range(3))
+    face_areas = 0.5 * np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+    return np.bincount(
+        faces.ravel(), weights=np.repeat(face_areas / 3, 3), minlength=len(coords)
+    )
+
+
+def vertex_normals(coords: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Unit vertex normals, averaging adjacent face normals weighted by area."""
+    v0, v1, v2 = (coords[faces[:, i]] for i in range(3))
+    face_normals = np.cross(v1 - v0, v2 - v0)
+    normals = np.column_stack(
+        [
+            np.bincount(
+                faces.ravel(),
+                weights=np.repeat(face_normals[:, k], 3),
+                minlength=len(coords),
+            )
+            for k in range(3)
+        ]
+    )
+    norms = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(norms > 0, norms, 1.0)
+
+
+def mesh_orientation(coords: np.ndarray, faces: np.ndarray) -> float:
+    """+1 if triangles are wound outwards (positive signed volume), else -1."""
+    v0, v1, v2 = (coords[faces[:, i]] - coords.mean(axis=0) for i in range(3))
+    return 1.0 if np.einsum("ij,ij->", v0, np.cross(v1, v2)) >= 0 else -1.0
+
+
+def adjacency_matrix(faces: np.ndarray, n_vertices: int) -> sparse.csr_matrix:
+    """Binary (vertices, vertices) adjacency matrix of a triangle mesh."""
+    rows = faces[:, [0, 1, 2, 1, 2, 0]].ravel()
+    cols = faces[:, [1, 2, 0, 0, 1, 2]].ravel()
+    adj = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(n_vertices, n_vertices)
+    )
+    adj.data[:] = 1.0
+    return adj
+
+
+def _mask_components(
+    mask: np.ndarray, faces: np.ndarray, adj: sparse.csr_matrix | None = None
+) -> np.ndarray:
+    """Connected component of each vertex in `mask` (-1 outside the mask)."""
+    if adj is None:
+        adj = adjacency_matrix(faces, len(mask))
+    _, components = connected_components(adj[mask][:, mask], directed=False)
+    labels = np.full(len(mask), -1)
+    labels[mask] = components
+    return labels
+
+
+def remove_islands(
+    mask: np.ndarray, faces: np.ndarray, adj: sparse.csr_matrix | None = None
+) -> np.ndarray:
+    """Keep the largest connected component of a vertex mask.
+
+    `adj` is the mesh adjacency if already known (e.g. `mesh_cache.adjacency`).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return mask
+    labels = _mask_components(mask, faces, adj)
+    return labels == np.argmax(np.bincount(labels[mask]))
+
+
+def fill_holes(
+    mask: np.ndarray, faces: np.ndarray, adj: sparse.csr_matrix | None = None
+) -> np.ndarray:
+    """Add to a vertex mask every region not connected to the largest outside one."""
+    mask = np.asarray(mask, dtype=bool)
+    return ~remove_islands(~mask, faces, adj)
+
+
+def barycentric_operator(
+    src_sphere: np.ndarray, faces: np.ndarray, tgt_sphere: np.ndarray, k: int = 8
+) -> sparse.csr_matrix:
+    """Sparse (target, source) operator interpolating within source triangles.
+
+    Each target vertex is assigned to the first of the `k` closest source
+    triangles (by centroid) whose cone from the sphere centre contains it, or
+    else to the closest one with its weights clamped, whatever the winding.
+    """
+    src = src_sphere / np.linalg.norm(src_sphere, axis=1, keepdims=True)
+    tgt = tgt_sphere / np.linalg.norm(tgt_sphere, axis=1, keepdims=True)
+    _, candidates = cKDTree(src[faces].mean(axis=1)).query(tgt, k=k)
+
+    weights = np.empty((len(tgt), 3))
+    cols = np.empty((len(tgt), 3), dtype=np.int64)
+    for start in range(0, len(tgt), BARYCENTRIC_CHUNK):
+        stop = start + BARYCENTRIC_CHUNK
+        corners = faces[candidates[start:stop]]
+        tri = src[corners]
+        point = tgt[start:stop, None, :]
+        # Signed volumes opposite each corner are proportional to its weight
+        bary = np.stack(
+            [
+                np.einsum(
+                    "ijk,ijk->ij",
+                    point,
+                    np.cross(tri[:, :, (i + 1) % 3], tri[:, :, (i + 2) % 3]),
+                )
+                for i in range(3)
+            ],
+            axis=-1,
+        )
+        # Inward-wound triangles have all their signed volumes negated
+        winding = np.einsum(
+            "ijk,ijk->ij", tri[:, :, 0], np.cross(tri[:, :, 1], tri[:, :, 2])
+        )
+        bary *= np.where(winding < 0, -1.0, 1.0)[..., None]
+        inside = np.all(bary >= -1e-12, axis=-1)
+        # Fall back to the closest triangle when no candidate contains the point
+        best = np.where(inside.any(axis=1), np.argmax(inside, axis=1), 0)
+        rows = np.arange(len(best))
+        bary = np.clip(bary[rows, best], 0.0, None)
+        total = bary.sum(axis=1, keepdims=True)
+        # Points facing away from the whole triangle get its centroid
+        bary = np.where(total > 0, bary, 1.0)
+        weights[start:stop] = bary / np.where(total > 0, total, 3.0)
+        cols[start:stop] = corners[rows, best]
+
+    return sparse.csr_matrix(
+        (weights.ravel(), (np.repeat(np.arange(len(tgt)), 3), cols.ravel())),
+        shape=(len(tgt), len(src)),
+    )
+
+
+def icosahedron() -> tuple[np.ndarray, np.ndarray]:
+    """Vertices (on the unit sphere) and outward-facing triangles."""
+    phi = (1 + np.sqrt(5)) / 2
+    coords = np.array(
+        [
+            [-1, phi, 0],
+            [1, phi, 0],
+            [-1, -phi, 0],
+            [1, -phi, 0],
+            [0, -1, phi],
+            [0, 1, phi],
+            [0, -1, -phi],
+            [0, 1, -phi],
+            [phi, 0, -1],
+            [phi, 0, 1],
+            [-phi, 0, -1],
+            [-phi, 0, 1],
+        ],
+        dtype=np.float64,
+    )
+    faces = np.array(
+        [
+            [0, 11, 5],
+            [0, 5, 1],
+            [0, 1, 7],
+            [0, 7, 10],
+            [0, 10, 11],
+            [1, 5, 9],
+            [5, 11, 4],
+            [11, 10, 2],
+            [10, 7, 6],
+            [7, 1, 8],
+            [3, 9, 4],
+            [3, 4, 2],
+            [3, 2, 6],
+            [3, 6, 8],
+            [3, 8, 9],
+            [4, 9, 5],
+            [2, 4, 11],
+            [6, 2, 10],
+            [8, 6, 7],
+            [9, 8, 1],
+        ]
+    )
+    return coords / np.linalg.norm(coords, axis=1, keepdims=True), faces
+
+
+def icosphere(frequency: int) -> tuple[np.ndarray, np.ndarray]:
+    """Geodesic sphere splitting each icosahedron edge into `frequency` segments."""
+    base_coords, base_faces = icosahedron()
+
+    # Barycentric grid (i, j) of a single face and its up/down triangles
+    i, j = (idx.ravel() for idx in np.mgrid[: frequency + 1, : frequency + 1])
+    keep = i + j <= frequency
+    i, j = i[keep], j[keep]
+    grid = np.full((frequency + 2, frequency + 2), -1)
+    grid[i, j] = np.arange(len(i))
+    up = i + j < frequency
+    down = i + j < frequency - 1
+    local_faces = np.concatenate(
+        [
+            np.column_stack(
+                [grid[i[up], j[up]], grid[i[up] + 1, j[up]], grid[i[up], j[up] + 1]]
+            ),
+            np.column_stack(
+                [
+                    grid[i[down] + 1, j[down]],
+                    grid[i[down] + 1, j[down] + 1],
+                    grid[i[down], j[down] + 1],
+                ]
+            ),
+        ]
+    )
+
+    bary = np.column_stack([frequency - i - j, i, j]) / frequency
+    points = np.einsum("pk,fkd->fpd", bary, base_coords[base_faces]).reshape(-1, 3)
+    # Points on shared edges are generated once per face; merge them
+    _, index, inverse = np.unique(
+        np.round(points, 9), axis=0, return_index=True, return_inverse=True
+    )
+    coords = points[index]
+    faces = inverse.ravel()[
+        (np.arange(len(base_faces))[:, None, None] * len(i) + local_faces).reshape(
+            -1, 3
+        )
+    ]
+    return coords / np.linalg.norm(coords, axis=1, keepdims=True), faces
+
+
+def weighted_mode(weights: sparse.spmatrix, labels: np.ndarray) -> np.ndarray:
+    """Label with the largest total weight in each row (0 for empty rows)."""
+    values, inverse = np.unique(labels, return_inverse=True)
+    coo = weights.tocoo()
+    votes = sparse.csr_matrix(
+        (coo.data, (coo.row, inverse[coo.col])), shape=(weights.shape[0], len(values))
+    )
+    out = values[np.asarray(votes.argmax(axis=1)).ravel()]
+    out[np.diff(votes.indptr) == 0] = 0
+    return out
+
+
+def cached_operator(name: str, key: str, build) -> sparse.csr_matrix:
+    """Load a sparse operator from the cache, building and saving it if needed."""
+    cache_fpath = CACHE_DIR / f"{name}_{key}.npz"
+    if cache_fpath.exists():
+        return sparse.load_npz(cache_fpath).tocsr()
+    operator = build().tocsr()
+    cache_fpath.parent.mkdir(parents=True, exist_ok=True)
+    sparse.save_npz(cache_fpath, operator)
+    return operator
+
+
+def load_metric(fpath: Path) -> np.ndarray:
+    """Return the first data array of a metric or label file."""
+    return np.asarray(nib.load(fpath).darrays[0].data)
+
+
+def save_surface(
+    coords: np.ndarray,
+    faces: np.ndarray,
+    fpath: Path,
+    hemi: str,
+    geometry: str = "Anatomical",
+) -> Path:
+    """Write a triangle mesh to a GIFTI surface file."""
+    gii = nib.GiftiImage(
+        meta=nib.gifti.GiftiMetaData(AnatomicalStructurePrimary=STRUCTURE_MAP[hemi])
+    )
+    gii.add_gifti_data_array(
+        nib.gifti.GiftiDataArray(
+            np.asarray(coords, dtype=np.float32),
+            intent="NIFTI_INTENT_POINTSET",
+            meta=nib.gifti.GiftiMetaData(GeometricType=geometry),
+        )
+    )
+    gii.add_gifti_data_array(
+        nib.gifti.GiftiDataArray(
+            np.asarray(faces, dtype=np.int32), intent="NIFTI_INTENT_TRIANGLE"
+        )
+    )
+    nib.save(gii, fpath)
+    return fpath
+
+
+def save_metric(
+    data: np.ndarray, fpath: Path, hemi: str, intent: str = "NIFTI_INTENT_NONE"
+) -> Path:
+    """Write per-vertex values to a GIFTI metric file."""
+    gii = nib.GiftiImage(
+        meta=nib.gifti.GiftiMetaData(AnatomicalStructurePrimary=STRUCTURE_MAP[hemi])
+    )
+    gii.add_gifti_data_array(
+        nib.gifti.GiftiDataArray(np.asarray(data, dtype=np.float32), intent=intent)
+    )
+    nib.save(gii, fpath)
+    return fpath
+
+
+def save_label(
+    data: np.ndarray,
+    fpath: Path,
+    hemi: str,
+    names: dict[int, str] | None = None,
+    colors: dict[int, tuple[float, float, float, float]] | None = None,
+) -> Path:
+    """Write per-vertex integer labels to a GIFTI label file.
+
+    Labels missing from `colors` get a random (but reproducible) colour.
+    """
+    data = np.asarray(data, dtype=np.int32)
+    names = names or {}
+    colors = colors or {}
+    table = nib.gifti.GiftiLabelTable()
+    rng = np.random.default_rng(seed=0)
+    for key in np.unique(data):
+        label = nib.gifti.GiftiLabel(key=int(key))
+        label.label = "???" if key == 0 else names.get(int(key), str(key))
+        if int(key) in colors:
+            label.rgba = colors[int(key)]
+        elif key == 0:
+            label.rgba = (0.0, 0.0, 0.0, 0.0)
+        else:
+            label.rgba = (*rng.random(3), 1.0)
+        table.labels.append(label)
+
+    gii = nib.GiftiImage(
+        labeltable=table,
+        meta=nib.gifti.GiftiMetaData(AnatomicalStructurePrimary=STRUCTURE_MAP[hemi]),
+    )
+    gii.add_gifti_data_array(
+        nib.gifti.GiftiDataArray(
+            data, intent="NIFTI_INTENT_LABEL", datatype="NIFTI_TYPE_INT32"
+        )
+    )
+    nib.save(gii, fpath)
+    return fpath
+
+
+def read_lut(fpath: Path) -> dict[int, str]:
+    """Parse an atlas lookup table (`<index> <name> ...`, header rows ignored)."""
+    lut = {}
+    for line in fpath.read_text().splitlines():
+        fields = line.split()
+        if not fields or not re.fullmatch(r"-?\d+", fields[0]):
+            continue
+        lut[int(fields[0])] = fields[1] if len(fields) > 1 else fields[0]
+    return lut
+
+
+def content_hash(*items: object) -> str:
+    """Hash file contents (for paths) and reprs (everything else) into a cache key."""
+    digest = hashlib.sha1()
+    for item in items:
+        if isinstance(item, Path):
+            with item.open("rb") as fh:
+                while chunk := fh.read(1 << 20):
+                    digest.update(chunk)
+        elif isinstance(item, np.ndarray):
+            digest.update(np.ascontiguousarray(item).tobytes())
+        else:
+            digest.update(repr(item).encode())
+    return digest.hexdigest()[:16]
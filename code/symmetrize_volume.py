@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "nibabel==5.3.2",
+# ]
+# ///
+
+"""Script to flip or symmetrize a volume left/right at constant memory.
+
+Replaces the external `fliplr.py`: the (uncompressed) NIfTI data is memory
+mapped and processed one slab at a time, mirroring the x axis within each slab.
+Values keep their on-disk dtype and scaling. Gzipped outputs are compressed as
+one gzip member per slab on a thread pool.
+"""
+
+import argparse
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+
+MODES = ("flip", "fill", "mean")
+SLAB_MB = 64
+GZIP_LEVEL = 6
+
+
+def mirror_affine(affine: np.ndarray, n_x: int) -> np.ndarray:
+    """Affine of the world-space (x -> -x) mirror image of a volume.
+
+    The data are reversed along the first voxel axis, so voxel `i` of the output
+    is the mirror of voxel `n_x - 1 - i` of the input.
+    """
+    flip = np.diag([-1.0, 1.0, 1.0, 1.0])
+    flip[0, 3] = n_x - 1
+    return np.diag([-1.0, 1.0, 1.0, 1.0]) @ affine @ flip
+
+
+def memmap_data(fpath: Path, proxy: nib.arrayproxy.ArrayProxy) -> np.memmap:
+    """Raw (unscaled) data of an uncompressed NIfTI, as (x, y, everything else)."""
+    shape = proxy.shape
+    return np.memmap(
+        fpath,
+        dtype=proxy.dtype,
+        mode="r",
+        offset=proxy.offset,
+        shape=(shape[0], shape[1], int(np.prod(shape[2:], dtype=np.int64))),
+        order="F",
+    )
+
+
+def symmetrize_slab(slab: np.ndarray, mode: str) -> np.ndarray:
+    """Flip a slab along x, or combine it with its mirror image."""
+    mirrored = slab[::-1]
+    if mode == "flip":
+        return mirrored
+    if mode == "fill":
+        # e.g. a single-hemisphere atlas, completed with its mirror
+        return np.where(slab != 0, slab, mirrored)
+    mean = (slab.astype(np.float64) + mirrored) / 2
+    if np.issubdtype(slab.dtype, np.integer):
+        mean = np.round(mean)
+    return mean.astype(slab.dtype)
+
+
+def compress(data: bytes, level: int = GZIP_LEVEL) -> bytes:
+    """Compress data as a standalone gzip member (zlib releases the GIL)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def uncompressed(in_fpath: Path, tmp_dir: Path) -> Path:
+    """Path to an uncompressed copy of a NIfTI (streamed if it is gzipped)."""
+    if in_fpath.suffix != ".gz":
+        return in_fpath
+    tmp_fpath = tmp_dir / in_fpath.name.removesuffix(".gz")
+    with gzip.open(in_fpath, "rb") as src, tmp_fpath.open("wb") as dst:
+        shutil.copyfileobj(src, dst, length=SLAB_MB * 1024**2)
+    return tmp_fpath
+
+
+def symmetrize_volume(
+    in_fpath: Path,
+    out_fpath: Path,
+    mode: str = "fill",
+    slab_mb: float = SLAB_MB,
+    jobs: int | None = None,
+) -> Path:
+    """Flip (`flip`) or symmetrize (`fill`, `mean`) a volume slab by slab."""
+    with tempfile.TemporaryDirectory(dir=out_fpath.parent) as tmp_dir:
+        nii_fpath = uncompressed(in_fpath, Path(tmp_dir))
+        img = nib.load(nii_fpath)
+        if nib.orientations.io_orientation(img.affine)[0, 0] != 0:
+            raise ValueError(f"First voxel axis of {in_fpath} is not left/right")
+
+        # Same on-disk dtype and scaling, so raw values can be copied as is
+        header = img.header.copy()
+        header.set_data_dtype(img.dataobj.dtype)
+        header.set_slope_inter(img.dataobj.slope, img.dataobj.inter)
+        if mode == "flip":
+            affine = mirror_affine(img.affine, img.shape[0])
+            header.set_sform(affine, code=int(img.header["sform_code"]) or 1)
+            header.set_qform(affine, code=int(img.header["qform_code"]) or 1)
+        elif not np.allclose(
+            mirror_affine(img.affine, img.shape[0]), img.affine, atol=1e-3
+        ):
+            print(
+                "WARNING: Voxel grid is not centred on x=0; mirroring about the "
+                "centre of the grid"
+            )
+
+        data = memmap_data(nii_fpath, img.dataobj)
+        bytes_per_plane = data.shape[0] * data.shape[1] * data.dtype.itemsize
+        step = max(1, int(slab_mb * 1024**2 // bytes_per_plane))
+        head = io.BytesIO()
+        header.write_to(head)
+        head.write(b"\x00" * (int(header.get_data_offset()) - head.tell()))
+
+        gzipped = out_fpath.name.endswith(".gz")
+        jobs = jobs or os.cpu_count()
+        with out_fpath.open("wb") as fh, ThreadPoolExecutor(max_workers=jobs) as pool:
+            fh.write(compress(head.getvalue()) if gzipped else head.getvalue())
+            in_flight = deque()
+            for start in range(0, data.shape[2], step):
+                slab = symmetrize_slab(
+                    np.asarray(data[:, :, start : start + step]), mode
+                )
+                chunk = slab.astype(data.dtype, copy=False).tobytes(order="F")
+                if not gzipped:
+                    fh.write(chunk)
+                    continue
+                # Keep a bounded number of slabs queued for compression
+                in_flight.append(pool.submit(compress, chunk))
+                while len(in_flight) > jobs:
+                    fh.write(in_flight.popleft().result())
+            while in_flight:
+                fh.write(in_flight.popleft().result())
+        del data
+    return out_fpath
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Flip or symmetrize a NIfTI volume left/right",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Modes:
+  flip  mirror the volume in world space (x -> -x), updating the affine
+  fill  fill empty (zero) voxels with their mirror, e.g. a one-hemisphere atlas
+  mean  average each voxel with its mirror
+
+Examples:
+  python symmetrize_volume.py D99_atlas_v2.0_right.nii.gz D99_atlas_v2.0_sym.nii.gz
+  python symmetrize_volume.py --mode flip src-D99_res-0p25mm_T1w.nii flipped.nii.gz
+        """,
+    )
+    parser.add_argument("input", type=Path, help="Input NIfTI volume")
+    parser.add_argument("output", type=Path, help="Output NIfTI volume")
+    parser.add_argument(
+        "--mode", choices=MODES, default="fill", help="(default: %(default)s)"
+    )
+    parser.add_argument(
+        "--slab-mb",
+        type=float,
+        default=SLAB_MB,
+        help="Size of the slabs processed at once, in MB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of compression threads"
+    )
+    args = parser.parse_args()
+
+    print(f"[{args.mode.upper()}] {args.input} -> {args.output}")
+    symmetrize_volume(
+        args.input, args.output, mode=args.mode, slab_mb=args.slab_mb, jobs=args.jobs
+    )
+
+
+if __name__ == "__main__":
+    main()
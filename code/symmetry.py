@@ -0,0 +1,98 @@
+"""Helpers to process one hemisphere of a symmetric template and mirror it.
+
+The left and right meshes of symmetric templates (e.g. NMT2Sym) are mirror
+images of each other, up to a reordering of the vertices. Once that vertex
+correspondence is known, any per-vertex output of the left hemisphere can be
+turned into the right one by a permutation, instead of being recomputed.
+"""
+
+from pathlib import Path
+
+import nibabel as nib
+import numpy as np
+from scipy.spatial import cKDTree
+
+if __package__:
+    from .mesh_cache import mesh_topology
+    from .surface_utils import CACHE_DIR, STRUCTURE_MAP, content_hash
+else:
+    from mesh_cache import mesh_topology
+    from surface_utils import CACHE_DIR, STRUCTURE_MAP, content_hash
+
+MIRROR_TOL = 1e-3
+
+
+def mirror_permutation(
+    left_fpath: Path, right_fpath: Path, tol: float = MIRROR_TOL
+) -> np.ndarray | None:
+    """Right vertex matching each left vertex, if the meshes mirror each other.
+
+    Left vertices are reflected through the mid-sagittal plane (estimated from
+    both meshes) and must each land within `tol` (mm) of a distinct right vertex,
+    with the triangles matching as well. Returns `None` otherwise.
+    """
+    cache_fpath = CACHE_DIR / f"mirror_{content_hash(left_fpath, right_fpath, tol)}.npy"
+    if cache_fpath.exists():
+        perm = np.load(cache_fpath)
+        return perm if perm.size else None
+
+    perm = _find_permutation(left_fpath, right_fpath, tol)
+    cache_fpath.parent.mkdir(parents=True, exist_ok=True)
+    np.save(cache_fpath, perm if perm is not None else np.empty(0, dtype=np.int64))
+    return perm
+
+
+def _find_permutation(
+    left_fpath: Path, right_fpath: Path, tol: float
+) -> np.ndarray | None:
+    """Match mirrored left vertices to right vertices (see `mirror_permutation`)."""
+    left_mesh, right_mesh = mesh_topology(left_fpath), mesh_topology(right_fpath)
+    left_coords = np.asarray(left_mesh["coords"], dtype=np.float64)
+    right_coords = np.asarray(right_mesh["coords"], dtype=np.float64)
+    left_faces, right_faces = left_mesh["faces"], right_mesh["faces"]
+    if left_coords.shape != right_coords.shape or left_faces.shape != right_faces.shape:
+        return None
+
+    midline = (left_coords[:, 0].mean() + right_coords[:, 0].mean()) / 2
+    mirrored = left_coords.copy()
+    mirrored[:, 0] = 2 * midline - mirrored[:, 0]
+    dist, perm = cKDTree(right_coords).query(mirrored, distance_upper_bound=tol)
+    if not np.all(np.isfinite(dist)) or len(np.unique(perm)) != len(perm):
+        return None
+
+    # Same triangles once re-indexed (mirroring only reverses their winding)
+    mapped = np.sort(perm[left_faces], axis=1)
+    right = np.sort(right_faces, axis=1)
+    mapped = mapped[np.lexsort(mapped.T[::-1])]
+    right = right[np.lexsort(right.T[::-1])]
+    return perm if np.array_equal(mapped, right) else None
+
+
+def mirror_data(data: np.ndarray, perm: np.ndarray) -> np.ndarray:
+    """Move per-vertex values of the left hemisphere onto the right vertices."""
+    mirrored = np.empty_like(data)
+    mirrored[perm] = data
+    return mirrored
+
+
+def mirror_gifti(src_fpath: Path, out_fpath: Path, perm: np.ndarray) -> Path:
+    """Write a right hemisphere copy of a left metric or label file."""
+    gii = nib.load(src_fpath)
+    for darray in gii.darrays:
+        if darray.intent in (
+            nib.nifti1.intent_codes["pointset"],
+            nib.nifti1.intent_codes["triangle"],
+        ):
+            raise ValueError(f"Only per-vertex data can be mirrored: {src_fpath}")
+        darray.data = mirror_data(np.asarray(darray.data), perm)
+    gii.meta["AnatomicalStructurePrimary"] = STRUCTURE_MAP["R"]
+    nib.save(gii, out_fpath)
+    return out_fpath
+
+
+def left_counterpart(fpath: Path) -> Path | None:
+    """Left hemisphere file matching a right hemisphere one, if it exists."""
+    if "hemi-R" not in fpath.name:
+        return None
+    left_fpath = fpath.with_name(fpath.name.replace("hemi-R", "hemi-L"))
+    return left_fpath if left_fpath.exists() else None
@@ -9,11 +9,15 @@
 
 """Script to perform midthickness transformation to target space."""
 
+import argparse
 import itertools as it
 import shutil
 from pathlib import Path
 
-from niwrap import use_docker, workbench
+if __package__:
+    from .profiling import PROFILER, add_profile_argument
+else:
+    from profiling import PROFILER, add_profile_argument
 
 HEMIS = ("L", "R")
 TEMPLATES = ("S1200", "Yerkes19")
@@ -22,6 +26,8 @@ DENSITIES = ("10k", "32k")
 
 def xfm_midthickness(input_dir: Path, src: str, tgt: str) -> None:
     """Perform midthickness transformation."""
+    from niwrap import workbench
+
     src_dir = input_dir / "Inputs" / src
     tgt_dir = input_dir / f"Outputs/{tgt}-{src}"
 
@@ -57,14 +63,36 @@ def xfm_midthickness(input_dir: Path, src: str, tgt: str) -> None:
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Transform midthickness surfaces to target space"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which pairs would be transformed without transforming them",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.dry_run:
+        for (src, tgt), den, hemi in it.product(
+            it.permutations(TEMPLATES, 2), DENSITIES, HEMIS
+        ):
+            print(f"  {src}-to-{tgt} (hemi={hemi}, den={den})")
+        return
+
     # Setup niwrap to use podman (set uid=0 to run as root inside the container)
+    from niwrap import use_docker
+
     input_dir = Path("share").absolute()
     use_docker(
         data_dir=Path("/tmp/styx_tmp"), docker_executable="podman", docker_user_id=0
     )
 
-    for src, tgt in it.permutations(TEMPLATES, 2):
-        xfm_midthickness(input_dir=input_dir, src=src, tgt=tgt)
+    with PROFILER.session(args.profile):
+        for src, tgt in it.permutations(TEMPLATES, 2):
+            with PROFILER.span(f"{src}-to-{tgt}", "stage"):
+                xfm_midthickness(input_dir=input_dir, src=src, tgt=tgt)
 
 
 if __name__ == "__main__":
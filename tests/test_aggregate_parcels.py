@@ -0,0 +1,63 @@
+import numpy as np
+from aggregate_parcels import collect_annotations, parcel_stats
+
+
+def brute_force_median(values, weights):
+    """Smallest value reaching half of the total weight, by a plain loop."""
+    keep = ~np.isnan(values)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return np.nan
+    order = np.argsort(values, kind="stable")
+    cum = np.cumsum(weights[order])
+    return values[order][np.searchsorted(cum, cum[-1] / 2)]
+
+
+def test_parcel_stats_hand_computed():
+    labels = np.array([0, 1, 1, 1, 1, 2, 2])
+    maps = np.array([[9.0], [1.0], [2.0], [3.0], [10.0], [np.nan], [4.0]])
+    areas = np.array([1.0, 1.0, 1.0, 1.0, 5.0, 1.0, 3.0])
+
+    stats = parcel_stats(labels, maps, areas)
+    np.testing.assert_array_equal(stats["parcel"], [1, 2])
+    # The large vertex outweighs the three small ones
+    np.testing.assert_allclose(stats["median"][:, 0], [10.0, 4.0])
+    np.testing.assert_allclose(stats["mean"][:, 0], [56 / 8, 4.0])
+    np.testing.assert_array_equal(stats["count"][:, 0], [4, 1])
+    np.testing.assert_allclose(stats["area"][:, 0], [8.0, 3.0])
+
+
+def test_weighted_medians_match_per_parcel_loop():
+    rng = np.random.default_rng(7)
+    labels = rng.integers(0, 12, 3000)
+    maps = rng.normal(size=(3000, 4))
+    maps[rng.random(maps.shape) < 0.2] = np.nan
+    maps[labels == 3, 1] = np.nan  # a parcel with no valid value in one map
+    areas = rng.random(3000)
+
+    stats = parcel_stats(labels, maps, areas)
+    for row, key in enumerate(stats["parcel"]):
+        in_parcel = labels == key
+        for col in range(maps.shape[1]):
+            expected = brute_force_median(maps[in_parcel, col], areas[in_parcel])
+            np.testing.assert_equal(stats["median"][row, col], expected)
+
+
+def test_collect_annotations_reads_vertex_txt_parcellations(tmp_path):
+    parc_dir = tmp_path / "parcellations"
+    parc_dir.mkdir()
+    np.savetxt(
+        parc_dir / "src-X_space-sym_atlas-A_desc-PC_annot.txt",
+        np.arange(2000) % 3,
+        fmt="%d",
+    )
+    np.savetxt(parc_dir / "src-X_hemi-L_desc-PC_annot.txt", np.ones(1000), fmt="%d")
+    # Lookup tables and parcellations without hemisphere are not per-vertex maps
+    (parc_dir / "src-X_desc-AT_annot.txt").write_text("1 V1\n2 V2\n")
+    np.savetxt(parc_dir / "src-X_desc-PC_annot.txt", np.ones(10), fmt="%d")
+
+    groups = collect_annotations(tmp_path)
+    assert sorted(groups) == [("X", "1k", "L"), ("X", "2k", "L"), ("X", "2k", "R")]
+    for hemi in ("L", "R"):
+        [fpath] = groups[("X", "2k", hemi)]["parcellations"]
+        assert fpath.name.startswith("src-X_space-sym")
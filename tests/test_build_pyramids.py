@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from build_pyramids import chain_operators, level_operators, resample_maps
+from surface_utils import icosphere, vertex_areas
+
+
+def level(frequency: int) -> dict[str, np.ndarray]:
+    sphere, faces = icosphere(frequency)
+    mid = sphere * [30.0, 40.0, 25.0]
+    return {
+        "sphere": sphere,
+        "faces": faces,
+        "mid": mid,
+        "areas": vertex_areas(mid, faces),
+    }
+
+
+@pytest.fixture
+def levels(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # operators are cached under share/.cache
+    return {"1k": level(10), "4k": level(20), "9k": level(30)}
+
+
+def test_level_operators_are_averaging(levels):
+    down, up = level_operators(levels["1k"], levels["4k"])
+    assert down.shape == (1002, 4002) and up.shape == (4002, 1002)
+    for operator in (down, up):
+        np.testing.assert_allclose(operator.sum(axis=1).A1, 1.0)
+        assert operator.min() >= 0
+
+    # Smooth fields survive a round trip through the coarser level
+    field = levels["4k"]["sphere"][:, 2]
+    assert np.abs(up @ (down @ field) - field).max() < 0.05
+
+
+def test_chain_operators_compose_through_the_pyramid(levels):
+    chains = chain_operators(levels)
+    assert set(chains) == {(src, tgt) for src in levels for tgt in levels if src != tgt}
+    np.testing.assert_allclose(chains[("1k", "9k")].sum(axis=1).A1, 1.0)
+    step_down = level_operators(levels["4k"], levels["9k"])[0]
+    expected = level_operators(levels["1k"], levels["4k"])[0] @ step_down
+    np.testing.assert_allclose(chains[("9k", "1k")].toarray(), expected.toarray())
+
+
+def test_resample_maps_ignores_nans(levels):
+    down, _ = level_operators(levels["1k"], levels["4k"])
+    maps = np.ones((4002, 2))
+    maps[::2, 1] = np.nan
+    maps[:, 0] = np.nan
+
+    resampled = resample_maps(down, maps)
+    assert np.isnan(resampled[:, 0]).all()
+    np.testing.assert_allclose(resampled[np.isfinite(resampled[:, 1]), 1], 1.0)
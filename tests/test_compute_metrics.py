@@ -0,0 +1,28 @@
+import numpy as np
+from compute_metrics import gaussian_curvature, inflated_depth, mean_curvature
+from mesh_cache import build_topology
+from surface_utils import icosphere
+
+
+def test_metrics_flipped_winding():
+    """Curvature and depth do not depend on which way the triangles are wound."""
+    sphere, faces = icosphere(12)
+    # A folded surface: radius modulated by a low-order harmonic
+    coords = sphere * (1 + 0.2 * np.sin(3 * sphere[:, [0]]) * sphere[:, [2]])
+    inflated = sphere * 1.3
+
+    results = []
+    for tris in (faces, faces[:, ::-1]):
+        mesh = build_topology(coords, tris)
+        areas = mesh["vertex_areas"].astype(np.float64)
+        results.append(
+            (
+                mean_curvature(coords, tris, areas, mesh["vertex_normals"]),
+                gaussian_curvature(coords, tris, areas),
+                inflated_depth(coords, areas, build_topology(inflated, tris)),
+            )
+        )
+    for outward, inward in zip(*results, strict=True):
+        np.testing.assert_allclose(outward, inward, atol=1e-5)
+    # Mean curvature of a convex shape is negative in this convention
+    assert np.median(results[0][0]) < 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from convert_surfaces import read_freesurfer, read_mni_obj
+from nibabel.freesurfer import read_geometry, write_geometry
+
+TETRAHEDRON = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+TRIANGLES = np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+
+
+def test_read_freesurfer_matches_nibabel(tmp_path):
+    fpath = tmp_path / "lh.white"
+    write_geometry(fpath, TETRAHEDRON, TRIANGLES)
+
+    coords, faces = read_freesurfer(fpath)
+    expected_coords, expected_faces = read_geometry(fpath)
+    np.testing.assert_allclose(coords, expected_coords)
+    np.testing.assert_array_equal(faces, expected_faces)
+
+
+def test_read_freesurfer_applies_cras(tmp_path):
+    """Like `mris_convert`, tkregister coordinates are moved by the c_ras."""
+    fpath = tmp_path / "rh.pial"
+    volume_info = {
+        "head": [2, 0, 20],
+        "valid": "1  # volume info valid",
+        "filename": "T1.mgz",
+        "volume": [256, 256, 256],
+        "voxelsize": [1.0, 1.0, 1.0],
+        "xras": [-1.0, 0.0, 0.0],
+        "yras": [0.0, 0.0, -1.0],
+        "zras": [0.0, 1.0, 0.0],
+        "cras": [1.5, -2.0, 3.0],
+    }
+    write_geometry(fpath, TETRAHEDRON, TRIANGLES, volume_info=volume_info)
+
+    coords, _ = read_freesurfer(fpath)
+    np.testing.assert_allclose(coords, TETRAHEDRON + [1.5, -2.0, 3.0])
+
+
+def test_read_freesurfer_rejects_other_files(tmp_path):
+    fpath = tmp_path / "lh.thickness"
+    fpath.write_bytes(b"\xff\xff\xff" + bytes(16))
+    with pytest.raises(ValueError, match="Not a FreeSurfer"):
+        read_freesurfer(fpath)
+
+
+def mni_obj(end_indices: list[int], indices: np.ndarray, colour_flag: int = 0) -> str:
+    """ASCII MNI polygon file of the tetrahedron."""
+    n_colours = {0: 1, 1: len(end_indices), 2: len(TETRAHEDRON)}[colour_flag]
+    lines = [f"P 0.3 0.3 0.4 10 1 {len(TETRAHEDRON)}"]
+    lines += [" ".join(map(str, point)) for point in TETRAHEDRON]
+    lines += ["0 0 1"] * len(TETRAHEDRON)
+    lines += [str(len(end_indices)), f"{colour_flag} " + "1 1 1 1 " * n_colours]
+    lines += [" ".join(map(str, end_indices)), " ".join(map(str, indices.ravel()))]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize("colour_flag", [0, 1, 2])
+def test_read_mni_obj(tmp_path, colour_flag):
+    fpath = tmp_path / "surf_left.obj"
+    fpath.write_text(mni_obj([3, 6, 9, 12], TRIANGLES, colour_flag))
+
+    coords, faces = read_mni_obj(fpath)
+    np.testing.assert_allclose(coords, TETRAHEDRON)
+    np.testing.assert_array_equal(faces, TRIANGLES)
+
+
+def test_read_mni_obj_rejects_polygons(tmp_path):
+    fpath = tmp_path / "quads.obj"
+    fpath.write_text(mni_obj([4, 8, 12], np.arange(12)))
+    with pytest.raises(ValueError, match="triangulated"):
+        read_mni_obj(fpath)
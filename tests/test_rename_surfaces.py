@@ -0,0 +1,62 @@
+import json
+import sys
+
+import pytest
+import rename_surfaces
+from surface_utils import icosphere, save_surface
+
+
+@pytest.fixture
+def share(tmp_path):
+    """Share directory with a MEBRAINS surface to rename and one matching nothing."""
+    unit, faces = icosphere(10)
+    tpl_dir = tmp_path / "Inputs" / "MEBRAINS"
+    tpl_dir.mkdir(parents=True)
+    (tmp_path / "Outputs").mkdir()
+    save_surface(unit, faces, tpl_dir / "lh.MEBRAINS.white.surf.gii", "L")
+    save_surface(unit, faces, tpl_dir / "notes.surf.gii", "L")
+    return tmp_path
+
+
+def run(monkeypatch, share, *args):
+    monkeypatch.setattr(sys, "argv", ["rename_surfaces.py", str(share), *args])
+    rename_surfaces.main()
+
+
+def names(share):
+    return sorted(fpath.name for fpath in (share / "Inputs" / "MEBRAINS").iterdir())
+
+
+def test_dry_run_lists_renames_only(share, monkeypatch, capsys):
+    run(monkeypatch, share, "--dry-run")
+
+    out = capsys.readouterr().out
+    assert (
+        "Inputs/MEBRAINS/lh.MEBRAINS.white.surf.gii -> "
+        "Inputs/MEBRAINS/src-MEBRAINS_den-1k_hemi-L_white.surf.gii"
+    ) in out
+    assert names(share) == ["lh.MEBRAINS.white.surf.gii", "notes.surf.gii"]
+    assert not (share / rename_surfaces.JOURNAL_FNAME).exists()
+
+
+def test_journal_skips_seen_files_and_undo_restores(share, monkeypatch, capsys):
+    run(monkeypatch, share)
+    assert names(share) == [
+        "notes.surf.gii",
+        "src-MEBRAINS_den-1k_hemi-L_white.surf.gii",
+    ]
+    journal = json.loads((share / rename_surfaces.JOURNAL_FNAME).read_text())
+    assert list(journal["unmatched"].values()) == ["Inputs/MEBRAINS/notes.surf.gii"]
+    assert len(journal["runs"]) == 1
+    assert "WARNING" in capsys.readouterr().out
+
+    # Nothing is decoded or warned about again
+    monkeypatch.setattr(rename_surfaces, "find_surfs_density", lambda fpaths: {})
+    run(monkeypatch, share)
+    out = capsys.readouterr().out
+    assert "WARNING" not in out and "Renamed 0 file(s)" in out
+
+    run(monkeypatch, share, "--undo")
+    assert names(share) == ["lh.MEBRAINS.white.surf.gii", "notes.surf.gii"]
+    journal = json.loads((share / rename_surfaces.JOURNAL_FNAME).read_text())
+    assert journal["runs"] == [] and journal["files"] == {}
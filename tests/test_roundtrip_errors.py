@@ -0,0 +1,77 @@
+import numpy as np
+from roundtrip_errors import find_registrations, registration_operator, roundtrip_errors
+from surface_utils import icosphere, save_surface
+
+
+def rotation(degrees: float) -> np.ndarray:
+    angle = np.deg2rad(degrees)
+    return np.array(
+        [
+            [np.cos(angle), -np.sin(angle), 0],
+            [np.sin(angle), np.cos(angle), 0],
+            [0, 0, 1],
+        ]
+    )
+
+
+def test_roundtrip_of_inverse_registrations_is_small(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    unit, faces = icosphere(16)
+    other, other_faces = icosphere(13)
+    # Spheres off the origin, as in template space
+    centre = np.array([5.0, -3.0, 10.0])
+    files = {
+        "sphere": tmp_path / "a_sphere.surf.gii",
+        "mid": tmp_path / "a_midthickness.surf.gii",
+    }
+    save_surface(centre + 50 * unit, faces, files["sphere"], "L")
+    save_surface(unit * [30.0, 40.0, 25.0], faces, files["mid"], "L")
+    save_surface(centre + 50 * other, other_faces, tmp_path / "b_sphere.surf.gii", "L")
+    # A -> B rotates by 10 degrees, B -> A rotates back
+    save_surface(
+        centre + 50 * unit @ rotation(10).T, faces, tmp_path / "ab.surf.gii", "L"
+    )
+    save_surface(
+        centre + 50 * other @ rotation(-10).T,
+        other_faces,
+        tmp_path / "ba.surf.gii",
+        "L",
+    )
+
+    forward = registration_operator(
+        tmp_path / "ab.surf.gii", tmp_path / "b_sphere.surf.gii"
+    )
+    backward = registration_operator(tmp_path / "ba.surf.gii", files["sphere"])
+    errors = roundtrip_errors(forward, backward, files)
+
+    assert errors["angle"].shape == errors["displacement"].shape == (len(unit),)
+    # Only interpolation error remains (vertex spacing is about 4 degrees)
+    assert errors["angle"].mean() < 1.0
+    assert errors["displacement"].mean() < 0.5
+
+
+def test_find_registrations_accepts_rsl_sources(tmp_path, capsys):
+    unit, faces = icosphere(4)
+    inputs, outputs = tmp_path / "Inputs", tmp_path / "Outputs"
+    for space, ext in (("A", "rsl.gii"), ("B", "surf.gii")):
+        (inputs / space).mkdir(parents=True)
+        for kind in ("sphere", "midthickness"):
+            save_surface(
+                unit,
+                faces,
+                inputs / space / f"src-{space}_den-0k_hemi-L_{kind}.{ext}",
+                "L",
+            )
+    for src, tgt in (("A", "B"), ("B", "C")):
+        (outputs / f"{tgt}-{src}").mkdir(parents=True)
+        fname = f"src-{src}_to-{tgt}_den-0k_hemi-L_sphere.surf.gii"
+        save_surface(unit, faces, outputs / f"{tgt}-{src}" / fname, "L")
+    (outputs / "B-C").mkdir()
+    save_surface(
+        unit, faces, outputs / "B-C" / "src-C_to-B_den-0k_hemi-L_sphere.surf.gii", "L"
+    )
+
+    registrations = find_registrations(inputs, outputs, "L")
+    assert set(registrations) == {("A", "B"), ("B", "C")}
+    assert registrations[("A", "B")]["sphere"].name.endswith(".rsl.gii")
+    assert "No C sphere or midthickness" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import nibabel as nib
+import numpy as np
+import pytest
+from surface_area import utils
+from surface_area.utils import decoded_size, load_giftis
+
+
+def save_gifti(fpath, n_rows, encoding="GIFTI_ENCODING_B64GZ"):
+    """GIFTI with a float32 pointset and an int32 triangle array."""
+    darrays = [
+        nib.gifti.GiftiDataArray(
+            np.zeros((n_rows, 3), np.float32), intent="pointset", encoding=encoding
+        ),
+        nib.gifti.GiftiDataArray(
+            np.zeros((2 * n_rows, 3), np.int32), intent="triangle", encoding=encoding
+        ),
+    ]
+    nib.save(nib.GiftiImage(darrays=darrays), fpath)
+    return fpath
+
+
+@pytest.mark.parametrize("encoding", ["GIFTI_ENCODING_B64GZ", "GIFTI_ENCODING_ASCII"])
+def test_decoded_size_from_headers(tmp_path, encoding):
+    fpath = save_gifti(tmp_path / "surf.gii", 5000, encoding)
+    # Compressed zeros take far less space on disk than decoded
+    assert decoded_size(fpath) == 5000 * 3 * 4 + 10000 * 3 * 4
+
+
+def test_decoded_size_falls_back_to_file_size(tmp_path):
+    fpath = tmp_path / "broken.gii"
+    fpath.write_text("<GIFTI><DataArray Dimensionality='x'>")
+    assert decoded_size(fpath) == fpath.stat().st_size
+    assert decoded_size(tmp_path / "missing.gii") == 0
+
+
+@pytest.mark.parametrize("max_bytes", [1, utils.MAX_BYTES_IN_FLIGHT])
+def test_load_giftis_keeps_order_and_reports_errors(tmp_path, max_bytes):
+    fpaths = [save_gifti(tmp_path / f"{i}.surf.gii", 100 * (i + 1)) for i in range(5)]
+    fpaths.insert(2, tmp_path / "missing.surf.gii")
+
+    # Even one file at a time, the file waited for is always decoded
+    results = list(
+        load_giftis(fpaths, max_workers=3, max_bytes=max_bytes, ordered=True)
+    )
+    assert [fpath for fpath, *_ in results] == fpaths
+    _, arrays, meta = results[2]
+    assert arrays is None and isinstance(meta["error"], FileNotFoundError)
+    _, arrays, meta = results[3]
+    assert arrays[0].shape == (300, 3) and meta["intents"] == ["pointset", "triangle"]
+
+
+def test_load_giftis_bounds_decoding_by_budget(tmp_path, monkeypatch):
+    fpaths = [save_gifti(tmp_path / f"{i}.surf.gii", 1000) for i in range(8)]
+    size = decoded_size(fpaths[0])
+    decoding, peak = 0, 0
+    lock = threading.Lock()
+    load_gifti = utils.load_gifti
+
+    def slow_load(fpath):
+        nonlocal decoding, peak
+        with lock:
+            decoding += 1
+            peak = max(peak, decoding)
+        time.sleep(0.02)
+        with lock:
+            decoding -= 1
+        return load_gifti(fpath)
+
+    monkeypatch.setattr(utils, "load_gifti", slow_load)
+    # Room for two files, on eight workers
+    loaded = list(load_giftis(fpaths, max_workers=8, max_bytes=2 * size))
+    assert sorted(fpath for fpath, *_ in loaded) == sorted(fpaths)
+    assert peak <= 2
+
+    # Workers waiting for budget are released when the caller stops early
+    for _ in load_giftis(fpaths, max_workers=4, max_bytes=1):
+        break
@@ -0,0 +1,40 @@
+import numpy as np
+from mesh_cache import adjacency, build_topology
+from surface_utils import (
+    barycentric_operator,
+    fill_holes,
+    icosphere,
+    remove_islands,
+)
+
+
+def test_barycentric_operator_flipped_winding():
+    """Inward-wound source triangles still interpolate every target vertex."""
+    src, faces = icosphere(8)
+    tgt, _ = icosphere(13)
+    outward = barycentric_operator(src, faces, tgt)
+    inward = barycentric_operator(src, faces[:, ::-1], tgt)
+
+    for operator in (outward, inward):
+        assert np.all(np.diff(operator.indptr) > 0)
+        np.testing.assert_allclose(operator.sum(axis=1).A1, 1.0)
+        # Interpolated positions stay close to the target sphere
+        assert np.abs(np.linalg.norm(operator @ src, axis=1) - 1).max() < 0.05
+    np.testing.assert_allclose(outward.toarray(), inward.toarray(), atol=1e-12)
+
+
+def test_mask_cleanup_with_cached_adjacency():
+    """Islands and holes are the same with the cached adjacency as without."""
+    coords, faces = icosphere(10)
+    mesh = build_topology(coords, faces)
+    mask = coords[:, 2] > 0.3
+    # An island away from the mask and a hole inside it
+    mask[np.argmin(coords[:, 2])] = True
+    mask[np.argmax(coords[:, 2])] = False
+
+    adj = adjacency(mesh)
+    cleaned = fill_holes(remove_islands(mask, faces, adj), faces, adj)
+    np.testing.assert_array_equal(
+        cleaned, fill_holes(remove_islands(mask, faces), faces)
+    )
+    np.testing.assert_array_equal(cleaned, coords[:, 2] > 0.3)
@@ -0,0 +1,65 @@
+import nibabel as nib
+import numpy as np
+import pytest
+from symmetrize_volume import mirror_affine, symmetrize_volume
+
+# 2 mm voxels, with the grid centred on x=0
+AFFINE = np.array(
+    [[2.0, 0, 0, -7.0], [0, 2.0, 0, -3.0], [0, 0, 2.0, -4.0], [0, 0, 0, 1]]
+)
+
+
+def run(tmp_path, data, mode, out_name="out.nii", **kwargs):
+    in_fpath = tmp_path / "in.nii"
+    nib.save(nib.Nifti1Image(data, AFFINE), in_fpath)
+    out_fpath = symmetrize_volume(in_fpath, tmp_path / out_name, mode=mode, **kwargs)
+    return nib.load(out_fpath)
+
+
+def test_mirror_affine_maps_voxels_to_mirrored_positions():
+    mirrored = mirror_affine(AFFINE, n_x=8)
+    for ijk in ([0, 0, 0], [3, 1, 2], [7, 2, 4]):
+        flipped = [7 - ijk[0], *ijk[1:]]
+        world = AFFINE @ [*flipped, 1]
+        np.testing.assert_allclose(mirrored @ [*ijk, 1], world * [-1, 1, 1, 1])
+    # A grid centred on x=0 is its own mirror
+    np.testing.assert_allclose(mirrored, AFFINE)
+
+
+@pytest.mark.parametrize("out_name", ["out.nii", "out.nii.gz"])
+def test_flip_reverses_x_in_slabs(tmp_path, out_name):
+    data = np.arange(8 * 4 * 5, dtype=np.int16).reshape(8, 4, 5)
+    # Slabs smaller than one plane are processed one plane at a time
+    img = run(tmp_path, data, "flip", out_name=out_name, slab_mb=1e-6, jobs=2)
+
+    np.testing.assert_array_equal(np.asanyarray(img.dataobj), data[::-1])
+    assert img.get_data_dtype() == np.int16
+    np.testing.assert_allclose(img.affine, mirror_affine(AFFINE, 8))
+
+
+def test_fill_completes_a_single_hemisphere(tmp_path):
+    data = np.zeros((8, 3, 2), dtype=np.uint8)
+    data[:4] = np.arange(1, 5)[:, None, None]
+
+    out = np.asanyarray(run(tmp_path, data, "fill").dataobj)
+    np.testing.assert_array_equal(out[:4], data[:4])
+    np.testing.assert_array_equal(out[4:], data[:4][::-1])
+
+
+def test_mean_rounds_integers_and_keeps_floats(tmp_path):
+    ints = np.zeros((4, 2, 2), dtype=np.int32)
+    ints[0] = 3
+    out = np.asanyarray(run(tmp_path, ints, "mean").dataobj)
+    np.testing.assert_array_equal(out[:, 0, 0], [2, 0, 0, 2])
+
+    floats = np.linspace(0, 1, 16, dtype=np.float32).reshape(4, 2, 2)
+    out = np.asanyarray(run(tmp_path, floats, "mean").dataobj)
+    np.testing.assert_allclose(out, (floats + floats[::-1]) / 2, rtol=1e-6)
+
+
+def test_rejects_volumes_not_stored_left_right(tmp_path):
+    in_fpath = tmp_path / "in.nii"
+    swapped = AFFINE[:, [1, 0, 2, 3]]
+    nib.save(nib.Nifti1Image(np.zeros((4, 4, 4), np.float32), swapped), in_fpath)
+    with pytest.raises(ValueError, match="not left/right"):
+        symmetrize_volume(in_fpath, tmp_path / "out.nii")
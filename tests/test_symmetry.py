@@ -0,0 +1,44 @@
+import numpy as np
+from surface_utils import icosphere, save_surface
+from symmetry import mirror_data, mirror_permutation
+
+
+def save_hemispheres(tmp_path, left, right, faces_left, faces_right):
+    left_fpath = tmp_path / "src-S_den-1k_hemi-L_midthickness.surf.gii"
+    right_fpath = tmp_path / "src-S_den-1k_hemi-R_midthickness.surf.gii"
+    save_surface(left, faces_left, left_fpath, "L")
+    save_surface(right, faces_right, right_fpath, "R")
+    return left_fpath, right_fpath
+
+
+def test_mirror_permutation_recovers_shuffled_vertices(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the permutation is cached under share/.cache
+    unit, faces = icosphere(9)
+    # Ellipsoidal hemisphere, left of a mid-sagittal plane at x=2
+    left = unit * [20.0, 30.0, 25.0] + [-20.0, 0.0, 0.0]
+    shuffle = np.random.default_rng(3).permutation(len(left))
+    right = np.empty_like(left)
+    right[shuffle] = left * [-1, 1, 1] + [4.0, 0.0, 0.0]
+    # Mirroring reverses the winding of the triangles
+    right_faces = shuffle[faces][:, ::-1]
+
+    perm = mirror_permutation(
+        *save_hemispheres(tmp_path, left, right, faces, right_faces)
+    )
+    np.testing.assert_array_equal(perm, shuffle)
+    np.testing.assert_array_equal(
+        mirror_data(np.arange(len(left)), perm), np.argsort(shuffle)
+    )
+
+
+def test_mirror_permutation_rejects_asymmetric_meshes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    unit, faces = icosphere(6)
+    left = unit * 20 - [25.0, 0.0, 0.0]
+    right = left * [-1, 1, 1]
+    right[0] += 0.5
+
+    assert (
+        mirror_permutation(*save_hemispheres(tmp_path, left, right, faces, faces))
+        is None
+    )